@@ -5,15 +5,67 @@ from dotenv import load_dotenv
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 import logging
+from contextlib import contextmanager
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.core.config import config
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 env_path = Path(__file__).parent.parent / '.env'
 print(env_path)
 load_dotenv(env_path)
 
-EMBEDDING_DIM = os.getenv("EMBEDDING_DIMENSIONS", 1536)
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+assert 0 < EMBEDDING_DIM <= 16000, f"EMBEDDING_DIMENSIONS must be between 1 and 16000, got {EMBEDDING_DIM}"
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw").lower()
+HNSW_M = os.getenv("HNSW_M")
+MAINTENANCE_WORK_MEM = os.getenv("MAINTENANCE_WORK_MEM", "2GB")
+MAX_PARALLEL_MAINTENANCE_WORKERS = int(os.getenv("MAX_PARALLEL_MAINTENANCE_WORKERS", "4"))
+
+VECTOR_INDEXES = [
+    ("faqs_question_embedding_idx", "faqs", "question_embedding"),
+    ("faq_variants_embedding_idx", "faq_variants", "embedding"),
+]
+
+
+def configure_index_params(vector_count: int) -> dict:
+    """HNSW build parameters scaled to the number of indexed vectors (HNSW_M overrides m)."""
+    if vector_count < 100_000:
+        params = {"m": 16, "ef_construction": 64}
+    elif vector_count <= 1_000_000:
+        params = {"m": 24, "ef_construction": 100}
+    else:
+        params = {"m": 32, "ef_construction": 128}
+
+    if HNSW_M:
+        params["m"] = int(HNSW_M)
+        params["ef_construction"] = max(params["ef_construction"], 2 * params["m"])
+
+    return params
+
+
+def build_vector_index_ddl(index_name: str, table_name: str, column_name: str, vector_count: int) -> str:
+    """
+    Embeddings are stored as full-precision `vector`, but indexed as a `halfvec`
+    expression: the graph is half the size and queries must cast the same way to use it.
+    """
+    if VECTOR_INDEX_TYPE == "ivfflat":
+        return f"""
+            CREATE INDEX {index_name}
+            ON {table_name}
+            USING ivfflat (({column_name}::halfvec({EMBEDDING_DIM})) halfvec_ip_ops)
+            WITH (lists = {config.app.ivfflat_lists(vector_count)});
+        """
+
+    params = configure_index_params(vector_count)
+    return f"""
+        CREATE INDEX {index_name}
+        ON {table_name}
+        USING hnsw (({column_name}::halfvec({EMBEDDING_DIM})) halfvec_ip_ops)
+        WITH (m = {params['m']}, ef_construction = {params['ef_construction']});
+    """
 
 
 class DatabaseInitializer:
@@ -21,8 +73,9 @@ class DatabaseInitializer:
         self.db_name = os.getenv('POSTGRES_DB')
         self.db_user = os.getenv('POSTGRES_USER')
         self.db_password = os.getenv('POSTGRES_PASSWORD')
-        self.db_host = 'localhost'
-        self.db_port = '5432'
+        self.db_host = os.getenv('DB_HOST', 'localhost')
+        self.db_port = os.getenv('DB_PORT', '5432')
+        self._conn = None
 
     def get_connection_string(self, database=None):
         db = database or self.db_name
@@ -42,6 +95,31 @@ class DatabaseInitializer:
             logger.error(f"Error connecting to database: {e}")
             raise
 
+    def get_connection(self):
+        """Connection to the application database, opened once and reused until `close()`."""
+        if self._conn is None or self._conn.closed:
+            self._conn = self.connect()
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        """Cursor on the reused connection; commits on success, rolls back on error."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def close(self):
+        if self._conn is not None and not self._conn.closed:
+            self._conn.close()
+        self._conn = None
+
     def create_database_if_not_exists(self):
         try:
             conn = self.connect(database='postgres')
@@ -69,7 +147,7 @@ class DatabaseInitializer:
 
     def initialize_extensions(self):
         try:
-            conn = self.connect()
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             cursor.execute("CREATE EXTENSION IF NOT EXISTS vector;")
@@ -78,89 +156,152 @@ class DatabaseInitializer:
             logger.info("pgvector extension created/verified")
 
             cursor.close()
-            conn.close()
 
         except psycopg2.Error as e:
             logger.error(f"Error creating extensions: {e}")
             raise
 
-    def create_tables(self):
+    def create_tables_no_index(self):
         try:
-            conn = self.connect()
+            conn = self.get_connection()
             cursor = conn.cursor()
 
-            cursor.execute("DROP TABLE IF EXISTS faq_variants CASCADE;")
-            cursor.execute("DROP TABLE IF EXISTS faqs CASCADE;")
+            # One round trip for the whole schema; psycopg2 runs it in a single transaction.
+            ddl_bundle = f"""
+            DROP TABLE IF EXISTS faq_variants CASCADE;
+            DROP TABLE IF EXISTS faqs CASCADE;
 
-            create_faqs_table_query = f"""
             CREATE TABLE faqs (
                 id SERIAL PRIMARY KEY,
                 question TEXT NOT NULL,
                 answer TEXT NOT NULL,
                 question_embedding vector({EMBEDDING_DIM})
             );
-            """
-            cursor.execute(create_faqs_table_query)
-            logger.info("Table 'faqs' created successfully")
 
-            cursor.execute("""
-                CREATE INDEX faqs_question_embedding_idx 
-                ON faqs 
-                USING ivfflat (question_embedding vector_cosine_ops)
-                WITH (lists = 100);
-            """)
-            logger.info("Created similarity search index on faqs.question_embedding")
-
-            create_variants_table_query = f"""
             CREATE TABLE faq_variants (
                 id SERIAL PRIMARY KEY,
                 faq_id INTEGER NOT NULL REFERENCES faqs(id) ON DELETE CASCADE,
                 variant TEXT NOT NULL,
                 embedding vector({EMBEDDING_DIM})
             );
-            """
-            cursor.execute(create_variants_table_query)
-            logger.info("Table 'faq_variants' created successfully")
 
-            cursor.execute("""
-                CREATE INDEX faq_variants_faq_id_idx
-                ON faq_variants(faq_id);
-            """)
-            logger.info("Created index on faq_variants.faq_id")
+            CREATE INDEX faq_variants_faq_id_idx
+            ON faq_variants(faq_id);
 
-            cursor.execute("""
-                CREATE INDEX faq_variants_embedding_idx
-                ON faq_variants 
-                USING ivfflat (embedding vector_cosine_ops)
-                WITH (lists = 100);
-            """)
-            logger.info("Created similarity search index on faq_variants.embedding")
+            COMMENT ON COLUMN faqs.question_embedding IS
+                'Unit L2 norm; cosine similarity = inner product (<#>)';
+            COMMENT ON COLUMN faq_variants.embedding IS
+                'Unit L2 norm; cosine similarity = inner product (<#>)';
 
+            -- Kept across re-initializations: embeddings keyed by SHA-256 of model and text.
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                hash BYTEA PRIMARY KEY,
+                model TEXT NOT NULL,
+                embedding vector NOT NULL
+            );
+            COMMENT ON COLUMN embedding_cache.embedding IS 'Unit L2 norm, as returned by EmbeddingService';
+            """
+            cursor.execute(ddl_bundle)
             conn.commit()
+            logger.info("Tables 'faqs' and 'faq_variants' created successfully")
+            logger.info("Created index on faq_variants.faq_id")
+            logger.info("Table 'embedding_cache' created/verified")
 
-            for table_name in ['faqs', 'faq_variants']:
-                cursor.execute("""
-                    SELECT column_name, data_type, character_maximum_length
-                    FROM information_schema.columns 
-                    WHERE table_name = %s
-                    ORDER BY ordinal_position;
-                """, (table_name,))
+            cursor.execute("""
+                SELECT table_name, column_name, data_type
+                FROM information_schema.columns 
+                WHERE table_name IN ('faqs', 'faq_variants')
+                ORDER BY table_name, ordinal_position;
+            """)
 
-                columns = cursor.fetchall()
-                logger.info(f"\nTable '{table_name}' structure:")
-                for col in columns:
-                    logger.info(f"  - {col[0]}: {col[1]}")
+            current_table = None
+            for table_name, column_name, data_type in cursor.fetchall():
+                if table_name != current_table:
+                    logger.info(f"\nTable '{table_name}' structure:")
+                    current_table = table_name
+                logger.info(f"  - {column_name}: {data_type}")
 
             cursor.close()
-            conn.close()
 
         except psycopg2.Error as e:
             logger.error(f"Error creating tables: {e}")
             raise
 
+    def drop_vector_indexes(self, cursor=None):
+        """
+        Drop the ANN indexes so bulk loads don't pay per-row index maintenance.
+        Pass `cursor` to run inside an existing transaction (committed by the caller).
+        """
+        if cursor is None:
+            with self._transaction() as own_cursor:
+                return self.drop_vector_indexes(own_cursor)
+
+        try:
+            for index_name, _, _ in VECTOR_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {index_name};")
+
+            logger.info("Dropped similarity search indexes")
+
+        except psycopg2.Error as e:
+            logger.error(f"Error dropping vector indexes: {e}")
+            raise
+
+    def create_vector_indexes(self, vector_counts: Dict[str, int], cursor=None):
+        """
+        Build the ANN indexes once the tables are loaded; each is sized for its own
+        table's row count in `vector_counts` (table name -> rows).
+        Indexes built on populated tables are faster to create and (for IVFFlat) trained on real data.
+        Pass `cursor` to run inside an existing transaction (committed by the caller).
+        """
+        if cursor is None:
+            with self._transaction() as own_cursor:
+                return self.create_vector_indexes(vector_counts, own_cursor)
+
+        try:
+            # SET LOCAL scopes the build settings to this transaction, which covers every index below.
+            cursor.execute("SET LOCAL maintenance_work_mem = %s;", (MAINTENANCE_WORK_MEM,))
+            cursor.execute("SET LOCAL max_parallel_maintenance_workers = %s;", (MAX_PARALLEL_MAINTENANCE_WORKERS,))
+            cursor.execute("ANALYZE faqs;")
+            cursor.execute("ANALYZE faq_variants;")
+
+            cursor.execute("CREATE INDEX IF NOT EXISTS faq_variants_faq_id_idx ON faq_variants(faq_id);")
+
+            for index_name, table_name, column_name in VECTOR_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {index_name};")
+                cursor.execute(build_vector_index_ddl(index_name, table_name, column_name, vector_counts[table_name]))
+                logger.info(f"Created {VECTOR_INDEX_TYPE} similarity search index on {table_name}.{column_name}")
+
+        except psycopg2.Error as e:
+            logger.error(f"Error creating vector indexes: {e}")
+            raise
+
+    def normalize_stored_embeddings(self, cursor=None):
+        """
+        Backfill: rescale stored embeddings that are not unit-length, so the inner
+        product used by search (`<#>`) equals cosine similarity for every row.
+        Pass `cursor` to run inside an existing transaction (committed by the caller).
+        """
+        if cursor is None:
+            with self._transaction() as own_cursor:
+                return self.normalize_stored_embeddings(own_cursor)
+
+        try:
+            for _, table_name, column_name in VECTOR_INDEXES:
+                cursor.execute(f"""
+                    UPDATE {table_name}
+                    SET {column_name} = l2_normalize({column_name})
+                    WHERE {column_name} IS NOT NULL
+                    AND abs(vector_norm({column_name}) - 1) > 1e-3;
+                """)
+                logger.info(f"Normalized {cursor.rowcount} embeddings in {table_name}.{column_name}")
+
+        except psycopg2.Error as e:
+            logger.error(f"Error normalizing stored embeddings: {e}")
+            raise
+
     def verify_setup(self):
         try:
-            conn = self.connect()
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             cursor.execute("""
@@ -182,9 +323,11 @@ class DatabaseInitializer:
             """)
 
             if cursor.fetchone():
-                cursor.execute("SELECT COUNT(*) FROM faqs;")
+                cursor.execute(
+                    "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = to_regclass('public.faqs');"
+                )
                 count = cursor.fetchone()[0]
-                logger.info(f"'faqs' table exists (current rows: {count})")
+                logger.info(f"'faqs' table exists (estimated rows: {count})")
             else:
                 logger.error("'faqs' table does NOT exist")
                 return False
@@ -196,9 +339,11 @@ class DatabaseInitializer:
             """)
 
             if cursor.fetchone():
-                cursor.execute("SELECT COUNT(*) FROM faq_variants;")
+                cursor.execute(
+                    "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = to_regclass('public.faq_variants');"
+                )
                 count = cursor.fetchone()[0]
-                logger.info(f"'faq_variants' table exists (current rows: {count})")
+                logger.info(f"'faq_variants' table exists (estimated rows: {count})")
             else:
                 logger.error("'faq_variants' table does NOT exist")
                 return False
@@ -215,7 +360,6 @@ class DatabaseInitializer:
                 logger.info(f"  - {idx[0]}")
 
             cursor.close()
-            conn.close()
 
             return True
 
@@ -228,11 +372,12 @@ class DatabaseInitializer:
         logger.info(f"Database: {self.db_name}")
         logger.info(f"Host: {self.db_host}:{self.db_port}")
         logger.info(f"Embedding dimensions: {EMBEDDING_DIM}")
+        logger.info(f"Vector index type: {VECTOR_INDEX_TYPE}")
 
         try:
             self.create_database_if_not_exists()
             self.initialize_extensions()
-            self.create_tables()
+            self.create_tables_no_index()
 
             if self.verify_setup():
                 logger.info("\n" + "=" * 50)
@@ -248,9 +393,12 @@ class DatabaseInitializer:
         except Exception as e:
             logger.error(f"Initialization failed: {e}")
             return False
+        finally:
+            self.close()
 
 
 def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     initializer = DatabaseInitializer()
 
     try:
@@ -269,7 +417,7 @@ def main():
     if success:
         logger.info("\n" + "=" * 50)
         logger.info("Database is ready for FAQ seeding!")
-        logger.info("Next step: Run the seed_database.py script")
+        logger.info("Next step: Run the seed_database.py script (it builds the similarity search indexes)")
         logger.info("=" * 50)
     else:
         logger.error("\n" + "=" * 50)
@@ -2,11 +2,14 @@ import json
 import logging
 import re
 from typing import List, Optional
-from openai import OpenAI, APIError, RateLimitError, APITimeoutError
+from openai import OpenAI, AsyncOpenAI, APIError, RateLimitError, APITimeoutError
 from src.core.config import config
+from src.core.llm_client import shared_http_client, shared_async_http_client
 
 logger = logging.getLogger(__name__)
 
+_WS = re.compile(r"\s+")
+
 
 class LLMService:
     def __init__(self):
@@ -14,7 +17,8 @@ class LLMService:
         if not getattr(self.cfg, "validate", None) or not self.cfg.validate():
             raise ValueError("OpenAI API key / config not set")
 
-        self.client = OpenAI(api_key=self.cfg.api_key)
+        self.client = OpenAI(api_key=self.cfg.api_key, http_client=shared_http_client)
+        self.aclient = AsyncOpenAI(api_key=self.cfg.api_key, http_client=shared_async_http_client)
         self.model: str = self.cfg.llm_model
 
         self.default_temperature: float = 0.7
@@ -33,70 +37,108 @@ class LLMService:
             return []
 
         n = max(1, min(int(n), 10))
+        request = self._build_request(text, n, temperature, seed, max_tokens)
+
+        try:
+            resp = self.client.chat.completions.create(**request)
+        except (APIError, RateLimitError, APITimeoutError) as e:
+            logger.error(f"LLM paraphrase call failed: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected LLM error: {e}")
+            raise
+
+        return self._parse_paraphrases(resp, n)
+
+    async def agenerate_paraphrases(
+        self,
+        text: str,
+        n: int = 3,
+        temperature: Optional[float] = None,
+        seed: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+    ) -> List[str]:
+        if not text or not text.strip():
+            return []
+
+        n = max(1, min(int(n), 10))
+        request = self._build_request(text, n, temperature, seed, max_tokens)
+
+        try:
+            resp = await self.aclient.chat.completions.create(**request)
+        except (APIError, RateLimitError, APITimeoutError) as e:
+            logger.error(f"LLM paraphrase call failed: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected LLM error: {e}")
+            raise
+
+        return self._parse_paraphrases(resp, n)
+
+    def _build_request(
+        self,
+        text: str,
+        n: int,
+        temperature: Optional[float],
+        seed: Optional[int],
+        max_tokens: Optional[int],
+    ) -> dict:
         temperature = self.default_temperature if temperature is None else float(temperature)
         max_tokens = self.default_max_tokens if max_tokens is None else int(max_tokens)
         seed = self.default_seed if seed is None else seed
 
         system_msg = (
             "You are a helpful assistant that rewrites user questions/queries.\n"
-            "You must only return a JSON array of distinct, natural paraphrases "
+            "You must only return a JSON object holding an array of distinct, natural paraphrases "
             "that preserve the original intent. No explanations."
         )
 
         user_msg = (
             f"Rewrite the following user query into {n} distinct paraphrases that keep the same intent. "
             "Use different wording and structure. Keep each under 120 characters. In case the user's query is not a question, rewrite it as a natural question. "
-            "Return ONLY a JSON array of strings.\n\n"
+            "Return ONLY a JSON object with a \"paraphrases\" array of strings.\n\n"
             "JSON output format example:\n"
             "{ \"paraphrases\": [\"<paraphrase 1>\", \"<paraphrase 2>\", \"<paraphrase 3>\"] }\n\n"
             f"The user query is: \"{text}\"\n"
         )
 
-        try:
-            resp = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_msg},
-                    {"role": "user", "content": user_msg},
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens,
-                seed=seed
-            )
-        except (APIError, RateLimitError, APITimeoutError) as e:
-            logger.error(f"LLM paraphrase call failed: {e}")
-            raise
-        except Exception as e:
-            logger.error(f"Unexpected LLM error: {e}")
-            raise
-
-        raw = resp.choices[0].message.content if resp.choices else "[]"
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_msg},
+                {"role": "user", "content": user_msg},
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "seed": seed,
+            "response_format": {"type": "json_object"},
+        }
+
+    @staticmethod
+    def _parse_paraphrases(resp, n: int) -> List[str]:
+        raw = resp.choices[0].message.content if resp.choices else "{}"
 
         paraphrases: List[str] = []
-        try:
-            parsed = json.loads(raw)
-            if isinstance(parsed, dict) and "paraphrases" in parsed and isinstance(parsed["paraphrases"], list):
-                paraphrases = [str(x) for x in parsed["paraphrases"]]
-            elif isinstance(parsed, list):
-                paraphrases = [str(x) for x in parsed]
-            else:
-                array_like = parsed.get("data") if isinstance(parsed, dict) else None
-                if isinstance(array_like, list):
-                    paraphrases = [str(x) for x in array_like]
-        except Exception:
-            logger.warning("Could not parse model output as JSON array.")
-            paraphrases = []
+        parsed = json.loads(raw)
+        if isinstance(parsed, dict) and "paraphrases" in parsed and isinstance(parsed["paraphrases"], list):
+            paraphrases = [str(x) for x in parsed["paraphrases"]]
+        elif isinstance(parsed, list):
+            paraphrases = [str(x) for x in parsed]
+        else:
+            array_like = parsed.get("data") if isinstance(parsed, dict) else None
+            if isinstance(array_like, list):
+                paraphrases = [str(x) for x in array_like]
 
         seen = set()
         cleaned: List[str] = []
         for p in paraphrases:
-            p = re.sub(r"\s+", " ", p or "").strip()
-            if p and p.lower() not in seen:
-                seen.add(p.lower())
+            p = _WS.sub(" ", p or "").strip()
+            key = p.casefold()
+            if p and key not in seen:
+                seen.add(key)
                 cleaned.append(p)
-
-        if len(cleaned) > n:
-            cleaned = cleaned[:n]
+                if len(cleaned) == n:
+                    break
 
         return cleaned
 
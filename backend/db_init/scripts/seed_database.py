@@ -1,12 +1,15 @@
+import argparse
+import asyncio
 import sys
 import logging
 from pathlib import Path
 from typing import List, Tuple, Dict
-from src.core.database import db_manager
-from src.core.embeddings import embedding_service
+from src.core.database import get_db_manager
+from src.core.embeddings import get_embedding_service
 from db_init.scripts.llm import llm_service
 from src.core.config import config
 from db_init.data.faq_data import get_all_faqs
+from db_init.initialize import DatabaseInitializer, EMBEDDING_DIM, VECTOR_INDEXES
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
@@ -19,11 +22,13 @@ logger = logging.getLogger(__name__)
 
 class FAQSeeder:
     def __init__(self):
-        self.db = db_manager
-        self.embeddings = embedding_service
+        self.db = get_db_manager()
+        self.embeddings = get_embedding_service()
         self.faqs = get_all_faqs()
         self.llm_service = llm_service
+        self.initializer = DatabaseInitializer()
         self.variants_per_question = 3
+        self.max_llm_workers = 8
 
     def clear_existing_data(self):
         try:
@@ -34,43 +39,54 @@ class FAQSeeder:
             raise
 
     def prepare_faq_data(self) -> List[Tuple]:
-        values = []
         total = len(self.faqs)
 
         logger.info(f"Generating embeddings for {total} FAQs...")
 
-        for idx, faq in enumerate(self.faqs, 1):
-            try:
-                embedding = self.embeddings.generate_embedding(faq["question"])
-                embedding_vector = self.embeddings.embedding_to_vector(embedding)
+        questions = [faq["question"] for faq in self.faqs]
 
-                values.append((
-                    faq["question"],
-                    faq["answer"],
-                    embedding_vector.tolist()
-                ))
+        try:
+            embeddings = self.embeddings.generate_embeddings_batch(questions)
+        except Exception as e:
+            logger.error(f"  Failed to embed FAQ questions: {e}")
+            raise
 
-                logger.info(f"  [{idx}/{total}] {faq['question'][:50]}...")
+        values = []
+        for idx, (faq, embedding) in enumerate(zip(self.faqs, embeddings), 1):
+            values.append((
+                faq["question"],
+                faq["answer"],
+                embedding
+            ))
 
-            except Exception as e:
-                logger.error(f"  [{idx}/{total}] Failed: {e}")
-                raise
+            logger.info(f"  [{idx}/{total}] {faq['question'][:50]}...")
 
         return values
 
     def insert_faqs(self, values: List[Tuple]) -> List[Dict]:
-        query = """
-            INSERT INTO faqs (question, answer, question_embedding)
-            VALUES %s
-            RETURNING id, question
-        """
-
         try:
-            inserted_records = self.db.execute_query_with_batch(
-                query=query,
-                values=values,
-                template="(%s, %s, %s::vector)"
-            )
+            with self.db.get_cursor() as cursor:
+                cursor.execute("""
+                    CREATE TEMP TABLE stage_faqs ON COMMIT DROP AS
+                    SELECT question, answer, question_embedding
+                    FROM faqs
+                    WITH NO DATA;
+                """)
+
+                self.db.copy_insert(
+                    table="stage_faqs",
+                    columns=["question", "answer", "question_embedding"],
+                    rows=values,
+                    cursor=cursor
+                )
+
+                cursor.execute("""
+                    INSERT INTO faqs (question, answer, question_embedding)
+                    SELECT question, answer, question_embedding
+                    FROM stage_faqs
+                    RETURNING id, question;
+                """)
+                inserted_records = cursor.fetchall()
 
             logger.info(f"Inserted {len(inserted_records)} FAQ records")
 
@@ -82,71 +98,75 @@ class FAQSeeder:
             raise
 
     def generate_and_insert_variants(self, faq_records: List[Dict]):
-        total_faqs = len(faq_records)
-        total_variants_inserted = 0
-
-        logger.info(f"\nGenerating {self.variants_per_question} variants per FAQ...")
-
-        for idx, faq_record in enumerate(faq_records, 1):
-            faq_id = faq_record["id"]
-            original_question = faq_record["question"]
-
-            try:
-                logger.info(f"\n  [{idx}/{total_faqs}] Processing: {original_question[:60]}...")
-
-                variants = self.llm_service.generate_paraphrases(
-                    text=original_question,
-                    n=self.variants_per_question,
-                    temperature=0.7
-                )
-
-                if not variants:
-                    logger.warning(f"    No variants generated for FAQ ID {faq_id}")
-                    continue
-
-                logger.info(f"    Generated {len(variants)} variants")
-
-                variant_values = []
-                for var_idx, variant_text in enumerate(variants, 1):
-                    try:
-                        variant_embedding = self.embeddings.generate_embedding(variant_text)
-                        variant_embedding_vector = self.embeddings.embedding_to_vector(variant_embedding)
+        """
+        Three phases, each a single fan-out or bulk call:
+        paraphrase every FAQ concurrently, embed all variants with concurrent batches, insert them with one COPY.
+        """
+        logger.info(f"\nPhase 1: generating {self.variants_per_question} variants for {len(faq_records)} FAQs "
+                    f"({self.max_llm_workers} concurrent requests)...")
+        variant_pairs, variant_embeddings = asyncio.run(self._generate_and_embed_variants(faq_records))
 
-                        variant_values.append((
-                            faq_id,
-                            variant_text,
-                            variant_embedding_vector.tolist()
-                        ))
+        if not variant_pairs:
+            logger.warning("No variants generated")
+            return 0
 
-                        logger.info(f"{var_idx}. {variant_text[:50]}...")
+        variant_values = [
+            (faq_id, variant_text, embedding)
+            for (faq_id, variant_text), embedding in zip(variant_pairs, variant_embeddings)
+        ]
 
-                    except Exception as e:
-                        logger.error(f"      Failed to embed variant {var_idx}: {e}")
-                        continue
+        logger.info("\nPhase 3: inserting variants...")
+        total_variants_inserted = self._insert_variants_batch(variant_values)
 
-                if variant_values:
-                    inserted_count = self._insert_variants_batch(variant_values)
-                    total_variants_inserted += inserted_count
-                    logger.info(f"    Inserted {inserted_count} variants for FAQ ID {faq_id}")
+        logger.info(f"\nTotal variants inserted: {total_variants_inserted}")
+        return total_variants_inserted
 
-            except Exception as e:
-                logger.error(f"  [{idx}/{total_faqs}] Failed to process FAQ ID {faq_id}: {e}")
+    async def _generate_and_embed_variants(self, faq_records: List[Dict]):
+        """Phases 1 and 2 share one event loop, and with it the pooled async HTTP connections."""
+        variant_pairs = await self._generate_all_variants(faq_records)
+        if not variant_pairs:
+            return [], None
+
+        logger.info(f"Phase 1 done: {len(variant_pairs)} variants generated")
+
+        logger.info(f"\nPhase 2: embedding {len(variant_pairs)} variants...")
+        variant_embeddings = await self.embeddings.agenerate_embeddings_batch(
+            [variant_text for _, variant_text in variant_pairs]
+        )
+        return variant_pairs, variant_embeddings
+
+    async def _generate_all_variants(self, faq_records: List[Dict]) -> List[Tuple[int, str]]:
+        semaphore = asyncio.Semaphore(self.max_llm_workers)
+
+        async def generate(faq_record: Dict) -> List[str]:
+            async with semaphore:
+                try:
+                    return await self.llm_service.agenerate_paraphrases(
+                        text=faq_record["question"],
+                        n=self.variants_per_question,
+                        temperature=0.7
+                    )
+                except Exception as e:
+                    logger.error(f"  Failed to generate variants for FAQ ID {faq_record['id']}: {e}")
+                    return []
+
+        results = await asyncio.gather(*(generate(faq_record) for faq_record in faq_records))
+
+        variant_pairs: List[Tuple[int, str]] = []
+        for faq_record, variants in zip(faq_records, results):
+            if not variants:
+                logger.warning(f"  No variants generated for FAQ ID {faq_record['id']}")
                 continue
+            variant_pairs.extend((faq_record["id"], variant_text) for variant_text in variants)
 
-        logger.info(f"\nTotal variants inserted: {total_variants_inserted}")
-        return total_variants_inserted
+        return variant_pairs
 
     def _insert_variants_batch(self, variant_values: List[Tuple]):
-        query = """
-            INSERT INTO faq_variants (faq_id, variant, embedding)
-            VALUES %s
-        """
-
         try:
-            count = self.db.batch_insert(
-                query=query,
-                values=variant_values,
-                template="(%s, %s, %s::vector)"
+            count = self.db.copy_insert(
+                table="faq_variants",
+                columns=["faq_id", "variant", "embedding"],
+                rows=variant_values
             )
             return count
         except Exception as e:
@@ -155,22 +175,36 @@ class FAQSeeder:
 
     def verify_seeding(self):
         try:
-            total_faqs = self.db.get_table_count('faqs')
-            logger.info(f"\nTotal FAQs in database: {total_faqs}")
+            total_faqs = self.db.get_estimated_count('faqs')
+            logger.info(f"\nTotal FAQs in database (estimated): {total_faqs}")
 
-            total_variants = self.db.get_table_count('faq_variants')
-            logger.info(f"Total variants in database: {total_variants}")
+            total_variants = self.db.get_estimated_count('faq_variants')
+            logger.info(f"Total variants in database (estimated): {total_variants}")
 
             if total_faqs > 0:
                 avg_variants = total_variants / total_faqs
                 logger.info(f" Average variants per FAQ: {avg_variants:.2f}")
 
             sample_query = """
-                SELECT id, question, 
-                       substring(answer, 1, 50) as answer_preview,
-                       vector_dims(question_embedding) as embedding_dims
-                FROM faqs 
-                LIMIT 3;
+                SELECT f.id, f.question, f.answer_preview, f.embedding_dims,
+                       COALESCE(
+                           json_agg(
+                               json_build_object('variant', fv.variant, 'dims', vector_dims(fv.embedding))
+                               ORDER BY fv.id
+                           ) FILTER (WHERE fv.id IS NOT NULL),
+                           '[]'
+                       ) as variants
+                FROM (
+                    SELECT id, question,
+                           substring(answer, 1, 50) as answer_preview,
+                           vector_dims(question_embedding) as embedding_dims
+                    FROM faqs
+                    ORDER BY id
+                    LIMIT 3
+                ) f
+                LEFT JOIN faq_variants fv ON fv.faq_id = f.id
+                GROUP BY f.id, f.question, f.answer_preview, f.embedding_dims
+                ORDER BY f.id;
             """
 
             samples = self.db.execute_query(sample_query)
@@ -183,20 +217,23 @@ class FAQSeeder:
                     logger.info(f"    A: {row[2]}...")
                     logger.info(f"    Embedding dims: {row[3]}")
 
-                    variant_query = """
-                        SELECT variant, vector_dims(embedding) as embedding_dims
-                        FROM faq_variants
-                        WHERE faq_id = %s
-                    """
-                    variants = self.db.execute_query(variant_query, (row[0],))
+                    variants = row[4]
                     if variants:
                         logger.info(f"    Variants ({len(variants)}):")
                         for v in variants:
-                            logger.info(f"      - {v[0][:60]}... (dims: {v[1]})")
+                            logger.info(f"      - {v['variant'][:60]}... (dims: {v['dims']})")
 
         except Exception as e:
             logger.error(f"Verification failed: {e}")
 
+    def report_exact_counts(self):
+        try:
+            total_faqs = self.db.get_table_count('faqs')
+            total_variants = self.db.get_table_count('faq_variants')
+            logger.info(f"\nExact counts: {total_faqs} FAQs, {total_variants} variants")
+        except Exception as e:
+            logger.error(f"Exact count failed: {e}")
+
     def test_similarity_search(self):
         test_query = "How can I change my password?"
 
@@ -207,18 +244,15 @@ class FAQSeeder:
             query_embedding = self.embeddings.generate_embedding(test_query)
 
             logger.info("\nSearching in FAQs table:")
-            faq_search_query = """
+            self.db.register_statement("seed_test_faq_search", f"""
                 SELECT question, answer,
-                       1 - (question_embedding <=> %s::vector) as similarity
+                       -(question_embedding::halfvec({EMBEDDING_DIM}) <#> $1::halfvec) as similarity
                 FROM faqs
-                ORDER BY question_embedding <=> %s::vector
-                LIMIT 3;
-            """
+                ORDER BY question_embedding::halfvec({EMBEDDING_DIM}) <#> $1::halfvec
+                LIMIT 3
+            """)
 
-            faq_results = self.db.execute_query(
-                faq_search_query,
-                (query_embedding, query_embedding)
-            )
+            faq_results = self.db.execute_prepared("seed_test_faq_search", (query_embedding,))
 
             if faq_results:
                 for idx, row in enumerate(faq_results, 1):
@@ -227,19 +261,16 @@ class FAQSeeder:
                     logger.info(f"     A: {row[1][:80]}...")
 
             logger.info("\nSearching in FAQ Variants table:")
-            variant_search_query = """
+            self.db.register_statement("seed_test_variant_search", f"""
                 SELECT fv.variant, f.question, f.answer,
-                       1 - (fv.embedding <=> %s::vector) as similarity
+                       -(fv.embedding::halfvec({EMBEDDING_DIM}) <#> $1::halfvec) as similarity
                 FROM faq_variants fv
                 JOIN faqs f ON f.id = fv.faq_id
-                ORDER BY fv.embedding <=> %s::vector
-                LIMIT 3;
-            """
+                ORDER BY fv.embedding::halfvec({EMBEDDING_DIM}) <#> $1::halfvec
+                LIMIT 3
+            """)
 
-            variant_results = self.db.execute_query(
-                variant_search_query,
-                (query_embedding, query_embedding)
-            )
+            variant_results = self.db.execute_prepared("seed_test_variant_search", (query_embedding,))
 
             if variant_results:
                 for idx, row in enumerate(variant_results, 1):
@@ -251,7 +282,26 @@ class FAQSeeder:
         except Exception as e:
             logger.error(f"Similarity search test failed: {e}")
 
-    def seed(self, clear_existing: bool = False):
+    def build_indexes(self):
+        """Index DDL runs on the seeder's own pool, so it targets the configured DB_HOST/DB_PORT."""
+        vector_counts = {
+            table_name: self.db.get_table_count(table_name)
+            for _, table_name, _ in VECTOR_INDEXES
+        }
+        with self.db.get_cursor() as cursor:
+            self.initializer.create_vector_indexes(vector_counts, cursor)
+
+    def normalize_existing(self):
+        try:
+            self.db.initialize_pool()
+            with self.db.get_cursor() as cursor:
+                self.initializer.normalize_stored_embeddings(cursor)
+            self.build_indexes()
+            logger.info("Stored embeddings normalized and indexes rebuilt")
+        finally:
+            self.db.close_pool()
+
+    def seed(self, clear_existing: bool = False, exact_count: bool = False):
         try:
             valid, errors = config.validate()
             if not valid:
@@ -261,6 +311,7 @@ class FAQSeeder:
                 return
 
             self.db.initialize_pool()
+            self.db.ensure_tables_cached(['faqs', 'faq_variants'])
 
             if not self.db.table_exists('faqs'):
                 logger.error("Table 'faqs' does not exist. Run initialization script first.")
@@ -273,6 +324,9 @@ class FAQSeeder:
             if clear_existing:
                 self.clear_existing_data()
 
+            with self.db.get_cursor() as cursor:
+                self.initializer.drop_vector_indexes(cursor)
+
             logger.info("\n" + "=" * 60)
             logger.info("STEP 1: Inserting FAQs")
             logger.info("=" * 60)
@@ -285,15 +339,23 @@ class FAQSeeder:
             self.generate_and_insert_variants(faq_records)
 
             logger.info("\n" + "=" * 60)
-            logger.info("STEP 3: Verification")
+            logger.info("STEP 3: Building Similarity Search Indexes")
+            logger.info("=" * 60)
+            self.build_indexes()
+
+            logger.info("\n" + "=" * 60)
+            logger.info("STEP 4: Verification")
             logger.info("=" * 60)
             self.verify_seeding()
 
             logger.info("\n" + "=" * 60)
-            logger.info("STEP 4: Testing Similarity Search")
+            logger.info("STEP 5: Testing Similarity Search")
             logger.info("=" * 60)
             self.test_similarity_search()
 
+            if exact_count:
+                self.report_exact_counts()
+
             logger.info("\n" + "=" * 60)
             logger.info("FAQ database seeding completed successfully!")
             logger.info("Your semantic FAQ system with variants is ready to use!")
@@ -307,8 +369,24 @@ class FAQSeeder:
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Seed the FAQ database with embeddings and variants")
+    parser.add_argument(
+        "--exact-count",
+        action="store_true",
+        help="Run exact COUNT(*) on faqs/faq_variants once seeding completes"
+    )
+    parser.add_argument(
+        "--normalize-existing",
+        action="store_true",
+        help="Only rescale already stored embeddings to unit length and rebuild the indexes (no reseeding)"
+    )
+    args = parser.parse_args()
+
     seeder = FAQSeeder()
-    seeder.seed(clear_existing=True)
+    if args.normalize_existing:
+        seeder.normalize_existing()
+    else:
+        seeder.seed(clear_existing=True, exact_count=args.exact_count)
 
 
 if __name__ == "__main__":
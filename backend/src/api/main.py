@@ -3,8 +3,11 @@ from contextlib import asynccontextmanager
 from datetime import datetime
 from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from src.core.database import db_manager
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
+from src.core.database import get_db_manager
+from src.core.embedding_batcher import embedding_batcher
+from src.core.embeddings import get_embedding_service
 from src.core.config import config
 from src.api.models.schemas import HealthCheckResponse
 from src.api.routes import faq
@@ -29,25 +32,37 @@ async def lifespan(app: FastAPI):
                 logger.error(f"   • {error}")
             raise RuntimeError("Invalid configuration")
 
-        db_manager.initialize_pool(minconn=2, maxconn=10)
+        db_manager = get_db_manager()
+        db_manager.initialize_pool()
         logger.info("Database connection pool initialized")
 
-        if not db_manager.table_exists('faqs'):
+        stats = db_manager.get_startup_stats()
+
+        if not stats['faqs_exists']:
             logger.error("Table 'faqs' does not exist")
             raise RuntimeError("Database not initialized. Run initialize.py first.")
 
-        if not db_manager.table_exists('faq_variants'):
+        if not stats['faq_variants_exists']:
             logger.error("Table 'faq_variants' does not exist")
             raise RuntimeError("Database not initialized. Run initialize.py first.")
 
-        faq_count = db_manager.get_table_count('faqs')
-        variant_count = db_manager.get_table_count('faq_variants')
+        faq_count = stats['faq_count']
+        variant_count = stats['variant_count']
+
+        logger.info(f"Database ready: ~{faq_count} FAQs, ~{variant_count} variants (estimated)")
 
-        logger.info(f"Database ready: {faq_count} FAQs, {variant_count} variants")
+        # ivfflat.probes is one session setting for both indexes; size it for the larger one.
+        session_settings = config.app.get_session_settings(max(faq_count, variant_count))
+        db_manager.configure_session(session_settings)
+        if session_settings:
+            logger.info(f"Vector search session settings: {session_settings}")
 
         if faq_count == 0:
             logger.warning("No FAQs in database. Run seed_database.py to populate.")
 
+        get_embedding_service()
+        await embedding_batcher.start()
+
         logger.info("FAQ RAG System ready!")
 
         from src.api.services.auth import api_key_auth
@@ -60,7 +75,8 @@ async def lifespan(app: FastAPI):
     yield
 
     logger.info("Shutting down FAQ RAG System...")
-    db_manager.close_pool()
+    await embedding_batcher.stop()
+    get_db_manager().close_pool()
     logger.info("Database connections closed")
     logger.info("Shutdown complete")
 
@@ -71,16 +87,19 @@ app = FastAPI(
     FAQ system using hybrid Retrieval Augmented Generation & LLM.
     """,
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=config.app.cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=86400,
 )
+app.add_middleware(GZipMiddleware, minimum_size=512)
 
 app.include_router(faq.router)
 
@@ -118,7 +137,7 @@ async def health_check():
     **Note:** This endpoint is public (no authentication required).
     """
     try:
-        faq_count = db_manager.get_table_count('faqs')
+        get_db_manager().ping()
         db_status = "connected"
 
     except Exception as e:
@@ -29,13 +29,13 @@ Output "IT", "Chat", or "General" only.
 """
 
 
-def get_router_prompt() -> ChatPromptTemplate:
-    system_message = SystemMessagePromptTemplate.from_template(ROUTER_SYSTEM_PROMPT)
-    human_message = HumanMessagePromptTemplate.from_template(ROUTER_USER_TEMPLATE)
+ROUTER_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessagePromptTemplate.from_template(ROUTER_SYSTEM_PROMPT),
+    HumanMessagePromptTemplate.from_template(ROUTER_USER_TEMPLATE)
+])
+
 
-    return ChatPromptTemplate.from_messages([
-        system_message,
-        human_message
-    ])
+def get_router_prompt() -> ChatPromptTemplate:
+    return ROUTER_PROMPT
 
 
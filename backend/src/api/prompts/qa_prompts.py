@@ -24,14 +24,14 @@ User Question: {question}
 Please provide a helpful answer based on the context above (if relevant) or your general knowledge."""
 
 
-def get_rag_prompt() -> ChatPromptTemplate:
-    system_message = SystemMessagePromptTemplate.from_template(RAG_SYSTEM_PROMPT)
-    human_message = HumanMessagePromptTemplate.from_template(RAG_USER_TEMPLATE)
+RAG_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessagePromptTemplate.from_template(RAG_SYSTEM_PROMPT),
+    HumanMessagePromptTemplate.from_template(RAG_USER_TEMPLATE)
+])
+
 
-    return ChatPromptTemplate.from_messages([
-        system_message,
-        human_message
-    ])
+def get_rag_prompt() -> ChatPromptTemplate:
+    return RAG_PROMPT
 
 
 GENERAL_SYSTEM_PROMPT = """You are a helpful FAQ assistant.
@@ -52,13 +52,13 @@ GENERAL_USER_TEMPLATE = """User Question: {question}
 Please provide a helpful, concise answer."""
 
 
-def get_general_prompt() -> ChatPromptTemplate:
-    system_message = SystemMessagePromptTemplate.from_template(GENERAL_SYSTEM_PROMPT)
-    human_message = HumanMessagePromptTemplate.from_template(GENERAL_USER_TEMPLATE)
+GENERAL_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessagePromptTemplate.from_template(GENERAL_SYSTEM_PROMPT),
+    HumanMessagePromptTemplate.from_template(GENERAL_USER_TEMPLATE)
+])
+
 
-    return ChatPromptTemplate.from_messages([
-        system_message,
-        human_message
-    ])
+def get_general_prompt() -> ChatPromptTemplate:
+    return GENERAL_PROMPT
 
 
@@ -33,17 +33,12 @@ Remember:
 - Return only the JSON object with "paraphrases" array"""
 
 
+VARIANT_GENERATION_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessagePromptTemplate.from_template(VARIANT_GENERATION_SYSTEM_PROMPT),
+    HumanMessagePromptTemplate.from_template(VARIANT_GENERATION_USER_TEMPLATE)
+])
+
+
 def get_variant_generation_prompt() -> ChatPromptTemplate:
-    system_message = SystemMessagePromptTemplate.from_template(
-        VARIANT_GENERATION_SYSTEM_PROMPT
-    )
-
-    human_message = HumanMessagePromptTemplate.from_template(
-        VARIANT_GENERATION_USER_TEMPLATE
-    )
-
-    return ChatPromptTemplate.from_messages([
-        system_message,
-        human_message
-    ])
+    return VARIANT_GENERATION_PROMPT
 
@@ -43,7 +43,7 @@ async def ask_question(request: QuestionRequest) -> QuestionResponse:
     try:
         logger.info(f"Received question: {request.question}")
 
-        response = qa_service.answer_question(
+        response = await qa_service.answer_question(
             user_question=request.question,
             generate_variants=request.generate_variants,
             num_variants=request.num_variants
@@ -94,7 +94,7 @@ async def search_faqs(
         )
 
     try:
-        response = qa_service.answer_question(
+        response = await qa_service.answer_question(
             user_question=q,
             generate_variants=generate_variants,
             num_variants=num_variants
@@ -0,0 +1,83 @@
+import logging
+import threading
+import time
+from typing import Dict, Hashable, List, Optional
+import numpy as np
+from src.api.models.schemas import QuestionResponse
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of answered questions, looked up by embedding similarity.
+
+    Embeddings are kept in a fixed (max_size, dimensions) matrix of unit vectors,
+    so a lookup is one matrix-vector product. Entries expire after `ttl_seconds`;
+    when the cache is full the least recently used entry is replaced.
+    Entries belong to a `partition` (any hashable, e.g. request options that shape the
+    response) and a lookup only matches entries of the same partition.
+    """
+
+    def __init__(self, dimensions: int, max_size: int = 1024, ttl_seconds: float = 3600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.RLock()
+        self._vectors = np.zeros((max_size, dimensions), dtype=np.float32)
+        self._expires_at = np.zeros(max_size, dtype=np.float64)
+        self._last_used = np.zeros(max_size, dtype=np.float64)
+        self._partitions = np.full(max_size, -1, dtype=np.int64)
+        self._partition_ids: Dict[Hashable, int] = {}
+        self._responses: List[Optional[QuestionResponse]] = [None] * max_size
+
+    def lookup(
+            self,
+            vector: np.ndarray,
+            threshold: float,
+            partition: Hashable = None
+    ) -> Optional[QuestionResponse]:
+        """Return the cached response in `partition` closest to `vector` if its cosine similarity is >= threshold."""
+        now = time.monotonic()
+
+        with self._lock:
+            partition_id = self._partition_ids.get(partition)
+            if partition_id is None:
+                return None
+
+            live = (self._expires_at > now) & (self._partitions == partition_id)
+            if not live.any():
+                return None
+
+            similarities = self._vectors @ vector
+            similarities[~live] = -np.inf
+            slot = int(np.argmax(similarities))
+
+            if similarities[slot] < threshold:
+                return None
+
+            self._last_used[slot] = now
+            logger.info(f"Semantic cache hit (similarity: {similarities[slot]:.4f})")
+            return self._responses[slot]
+
+    def add(self, vector: np.ndarray, response: QuestionResponse, partition: Hashable = None):
+        now = time.monotonic()
+
+        with self._lock:
+            partition_id = self._partition_ids.setdefault(partition, len(self._partition_ids))
+            expired = np.flatnonzero(self._expires_at <= now)
+            slot = int(expired[0]) if expired.size else int(np.argmin(self._last_used))
+
+            self._vectors[slot] = vector
+            self._expires_at[slot] = now + self.ttl_seconds
+            self._last_used[slot] = now
+            self._partitions[slot] = partition_id
+            self._responses[slot] = response
+
+    def clear(self):
+        with self._lock:
+            self._expires_at[:] = 0.0
+            self._last_used[:] = 0.0
+            self._partitions[:] = -1
+            self._partition_ids.clear()
+            self._responses = [None] * self.max_size
@@ -1,25 +1,38 @@
-import os
 import secrets
+from functools import lru_cache
 from fastapi import HTTPException, status, Header
+from src.core.config import config
 
 
 class APIKeyAuth:
     def __init__(self):
         self.valid_keys = self._load_api_keys()
+        self._encoded_keys = [key.encode() for key in self.valid_keys]
+        self._validate = lru_cache(maxsize=256)(self._validate_key)
 
     @staticmethod
     def _load_api_keys() -> set:
-        keys_str = os.getenv("API_KEYS", "")
-
-        if not keys_str:
+        if not config.app.api_keys:
             demo_key = "demo_key"
             print(f"No API keys configured. Using demo key: {demo_key}")
             return {demo_key}
 
-        return set(key.strip() for key in keys_str.split(",") if key.strip())
+        return set(config.app.api_keys)
 
     def __call__(self, x_api_key: str = Header(..., description="API Key for authentication")):
-        if x_api_key not in self.valid_keys:
+        return self._validate(x_api_key)
+
+    def _validate_key(self, x_api_key: str) -> dict:
+        """
+        Constant-time check against every configured key. Only valid keys are
+        memoized, since a raised exception is never cached.
+        """
+        candidate = x_api_key.encode()
+        valid = False
+        for key in self._encoded_keys:
+            valid |= secrets.compare_digest(candidate, key)
+
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid API Key",
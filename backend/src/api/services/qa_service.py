@@ -1,10 +1,16 @@
+import asyncio
 import logging
+import re
 import time
-from typing import List, Dict
+from functools import cached_property
+from typing import List, Dict, Optional
+from cachetools import TTLCache
 from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
 from src.api.prompts.ai_router_prompts import get_router_prompt
 from src.core.config import config
+from src.core.llm_client import make_chat
+from src.core.embedding_batcher import embedding_batcher
+from src.api.services.answer_cache import SemanticAnswerCache
 from src.api.services.retrieval_service import retrieval_service
 from src.api.services.variant_service import variant_service
 from src.api.prompts.qa_prompts import get_rag_prompt, get_general_prompt
@@ -12,38 +18,70 @@ from src.api.models.schemas import QuestionResponse, SimilarMatch
 
 logger = logging.getLogger(__name__)
 
+# Questions these match are classified without calling the LLM router; anything
+# else (including greetings followed by a question) goes to the router.
+GREETING_RE = re.compile(
+    r'(hi|hello|hey|good (morning|afternoon|evening)|thanks|thank you|bye)( there)?[\s!.,]*',
+    re.I
+)
+# Only terms that are unambiguous about the platform's own accounts.
+IT_TERMS = frozenset({
+    'login', 'logout', 'password', 'passwords', 'mfa', '2fa',
+    'username', 'credentials', 'signup',
+})
+_WORD_RE = re.compile(r'\w+')
+
 
 class QuestionAnsweringService:
+    _CTX_TMPL = "FAQ {i}:\nQ: {q}\nA: {a}\n"
+
     def __init__(self):
         self.retrieval_service = retrieval_service
         self.variant_service = variant_service
+        self.embedding_batcher = embedding_batcher
         self.config = config
 
-        self.llm = ChatOpenAI(
-            model=config.openai.llm_model,
-            temperature=0.7,
-            api_key=config.openai.api_key
+        self.answer_cache = SemanticAnswerCache(
+            dimensions=config.openai.embedding_dimensions,
+            max_size=config.app.semantic_cache_size,
+            ttl_seconds=config.app.semantic_cache_ttl
         )
+        self.cache_threshold = config.app.semantic_cache_threshold
 
         self.rag_prompt = get_rag_prompt()
         self.general_prompt = get_general_prompt()
-
         self.router_prompt = get_router_prompt()
-        self.llm_router = self.router_prompt | self.llm | StrOutputParser()
 
-        self.rag_chain = self.rag_prompt | self.llm | StrOutputParser()
-        self.general_chain = self.general_prompt | self.llm | StrOutputParser()
+        self._router_cache = TTLCache(maxsize=1024, ttl=3600)
 
         self.confidence_threshold = float(
             getattr(config.app, 'confidence_threshold', 0.75)
         )
 
         self.default_general_answer = "This is not really what I was trained for, therefore I cannot answer. Try again."
+        self.llm_failure_answer = "I apologize, but I'm unable to generate an answer at this time. Please try rephrasing your question or contact support."
 
         logger.info(f"QA Service initialized with confidence threshold: {self.confidence_threshold}")
         logger.info("Using LangChain for all LLM operations")
 
-    def answer_question(
+    @cached_property
+    def llm(self):
+        """Built on first use so importing the service doesn't construct the client."""
+        return make_chat(temperature=0.7)
+
+    @cached_property
+    def llm_router(self):
+        return self.router_prompt | self.llm | StrOutputParser()
+
+    @cached_property
+    def rag_chain(self):
+        return self.rag_prompt | self.llm | StrOutputParser()
+
+    @cached_property
+    def general_chain(self):
+        return self.general_prompt | self.llm | StrOutputParser()
+
+    async def answer_question(
             self,
             user_question: str,
             generate_variants: bool = True,
@@ -53,9 +91,9 @@ class QuestionAnsweringService:
         Main method to answer user questions with hybrid RAG.
 
         Workflow:
-        1. Generate question variants using LangChain (via variant_service)
-        2. Create embeddings for original + variants
-        3. Search database for similar FAQs
+        1. Start routing, variant generation and the question embedding concurrently
+        2. Return a cached answer if a near-identical question was answered recently
+        3. Embed the variants and search database for similar FAQs
         4. If confidence >= threshold: return DB answer
         5. If confidence < threshold: generate answer with LangChain
 
@@ -68,13 +106,42 @@ class QuestionAnsweringService:
             QuestionResponse with answer, confidence, and metadata
         """
         start_time = time.time()
+        # Cached responses carry generated_variants, so only reuse them for the same variant options.
+        cache_partition = (True, num_variants) if generate_variants else (False, 0)
+
+        question_category = self._prefilter_category(user_question)
+        router_task = None
+        if question_category is None:
+            router_task = asyncio.create_task(self._route(user_question))
+
+        variant_task = None
+        if generate_variants:
+            logger.info(f"Generating {num_variants} variants for: {user_question}")
+            variant_task = asyncio.create_task(self.variant_service.agenerate_variants(
+                text=user_question,
+                n=num_variants,
+                temperature=0.7
+            ))
 
         try:
-            question_category = self.llm_router.invoke({
-                "question": user_question
-            })
+            query_embedding = await self.embedding_batcher.embed(user_question)
+
+            cached = self.answer_cache.lookup(
+                query_embedding,
+                threshold=self.cache_threshold,
+                partition=cache_partition
+            )
+            if cached is not None:
+                self._cancel(router_task, variant_task)
+                processing_time = (time.time() - start_time) * 1000
+                logger.info(f"Question answered from semantic cache in {processing_time:.2f}ms")
+                return cached.model_copy(update={'processing_time_ms': round(processing_time, 2)})
+
+            if router_task is not None:
+                question_category = await router_task
 
             if "general" in question_category.lower():
+                self._cancel(variant_task)
                 processing_time = (time.time() - start_time) * 1000
 
                 response = QuestionResponse(
@@ -87,24 +154,23 @@ class QuestionAnsweringService:
                     processing_time_ms=round(processing_time, 2)
                 )
 
+                self.answer_cache.add(query_embedding, response, partition=cache_partition)
                 logger.info(f"Question answered in {processing_time:.2f}ms")
                 return response
 
             variants = []
-            if generate_variants:
-                logger.info(f"Generating {num_variants} variants for: {user_question}")
-                variants = self.variant_service.generate_variants(
-                    text=user_question,
-                    n=num_variants,
-                    temperature=0.7
-                )
+            generated_variants = None
+            if variant_task is not None:
+                variants = await variant_task
+                generated_variants = variants
                 logger.info(f"Generated variants: {variants}")
 
             logger.info("Searching for similar FAQs...")
-            matches, embeddings = self.retrieval_service.search_with_metadata(
+            matches, embeddings = await self.retrieval_service.asearch_with_metadata(
                 user_query=user_question,
                 query_variants=variants,
-                top_k=5
+                top_k=5,
+                precomputed_query_embedding=query_embedding
             )
 
             best_match = matches[0] if matches else None
@@ -118,7 +184,7 @@ class QuestionAnsweringService:
                 logger.info("Using database answer (confidence above threshold)")
             else:
                 logger.info("✗ Confidence below threshold, generating LLM answer")
-                answer = self._generate_llm_answer(user_question, matches)
+                answer = await self._generate_llm_answer(user_question, matches)
                 source = 'llm'
 
             processing_time = (time.time() - start_time) * 1000
@@ -129,14 +195,17 @@ class QuestionAnsweringService:
                 confidence=confidence,
                 matched_faq=self._build_similar_match(best_match) if best_match else None,
                 all_matches=[self._build_similar_match(m) for m in matches],
-                generated_variants=variants if generate_variants else None,
+                generated_variants=generated_variants,
                 processing_time_ms=round(processing_time, 2)
             )
 
+            if answer != self.llm_failure_answer:
+                self.answer_cache.add(query_embedding, response, partition=cache_partition)
             logger.info(f"Question answered in {processing_time:.2f}ms")
             return response
 
         except Exception as e:
+            self._cancel(router_task, variant_task)
             logger.error(f"Error answering question: {e}", exc_info=True)
             processing_time = (time.time() - start_time) * 1000
             return QuestionResponse(
@@ -149,7 +218,34 @@ class QuestionAnsweringService:
                 processing_time_ms=round(processing_time, 2)
             )
 
-    def _generate_llm_answer(
+    async def _route(self, user_question: str) -> str:
+        """Router LLM classification, cached for exact repeats of the same question."""
+        key = user_question.lower().strip()
+        category = self._router_cache.get(key)
+        if category is None:
+            category = await self.llm_router.ainvoke({
+                "question": user_question
+            })
+            self._router_cache[key] = category
+        return category
+
+    @staticmethod
+    def _prefilter_category(user_question: str) -> Optional[str]:
+        """Classify greetings and obvious IT questions locally; None means ask the router."""
+        if GREETING_RE.fullmatch(user_question.strip()):
+            return "Chat"
+        if IT_TERMS.intersection(_WORD_RE.findall(user_question.lower())):
+            return "IT"
+        return None
+
+    @staticmethod
+    def _cancel(*tasks: Optional[asyncio.Task]):
+        """Cancel LLM calls whose results are no longer needed."""
+        for task in tasks:
+            if task is not None and not task.done():
+                task.cancel()
+
+    async def _generate_llm_answer(
             self,
             user_question: str,
             context_matches: List[Dict]
@@ -164,14 +260,14 @@ class QuestionAnsweringService:
                 logger.info(f"Using RAG mode with {len(context_faqs)} context FAQs")
                 context_text = self._build_context(context_faqs)
 
-                answer = self.rag_chain.invoke({
+                answer = await self.rag_chain.ainvoke({
                     "context": context_text,
                     "question": user_question
                 })
             else:
                 logger.info("Using general assistant mode (no relevant context)")
 
-                answer = self.general_chain.invoke({
+                answer = await self.general_chain.ainvoke({
                     "question": user_question
                 })
 
@@ -181,18 +277,14 @@ class QuestionAnsweringService:
 
         except Exception as e:
             logger.error(f"Failed to generate LLM answer: {e}", exc_info=True)
-            return "I apologize, but I'm unable to generate an answer at this time. Please try rephrasing your question or contact support."
+            return self.llm_failure_answer
 
     @staticmethod
     def _build_context(matches: List[Dict]) -> str:
-        context_parts = []
-        for i, match in enumerate(matches, 1):
-            context_parts.append(
-                f"FAQ {i}:\n"
-                f"Q: {match['question']}\n"
-                f"A: {match['answer']}\n"
-            )
-        return "\n".join(context_parts)
+        return "\n".join(
+            QuestionAnsweringService._CTX_TMPL.format(i=i, q=match['question'], a=match['answer'])
+            for i, match in enumerate(matches, 1)
+        )
 
     @staticmethod
     def _build_similar_match(match: Dict) -> SimilarMatch:
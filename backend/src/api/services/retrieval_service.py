@@ -1,16 +1,89 @@
+import asyncio
+import heapq
 import logging
-from typing import List, Dict, Tuple
+import threading
+from functools import cached_property
+from operator import itemgetter
+from typing import List, Dict, Optional, Tuple
 import numpy as np
-from src.core.database import db_manager
-from src.core.embeddings import embedding_service
+from src.core.config import config
+from src.core.database import get_db_manager, to_vector_literal
+from src.core.embeddings import get_embedding_service
+from src.core.embedding_batcher import embedding_batcher
 
 logger = logging.getLogger(__name__)
 
+# Embeddings are stored as fp32 `vector`; the HNSW indexes are built on this
+# halfvec cast of the columns, so the ORDER BY expressions must match it exactly.
+EMBEDDING_HALFVEC = f"halfvec({config.openai.embedding_dimensions})"
+
+# Candidates from both tables for every query vector in one round trip: each query
+# takes its $2 nearest rows per table from the halfvec index, and every candidate is
+# returned once with its fp32 embedding so it can be rescored exactly. The embedding is
+# sent in pgvector's binary format (vector_send: int16 dim, int16 unused, big-endian
+# float32s) as bytea, which psycopg2 decodes in C; the vector text format would be
+# parsed float by float in Python.
+# $1 is a halfvec[] of query embeddings. One statement for all embeddings beats
+# concurrent per-embedding queries: it needs a single pooled connection and round trip.
+BATCH_SEARCH_STATEMENT = f"""
+    SELECT DISTINCT ON (r.source, r.row_id)
+        r.faq_id,
+        r.question,
+        r.answer,
+        r.matched_text,
+        r.source,
+        vector_send(r.embedding)
+    FROM unnest($1::halfvec[]) AS q(vec)
+    CROSS JOIN LATERAL (
+        (
+            SELECT
+                f.id AS row_id,
+                f.id AS faq_id,
+                f.question,
+                f.answer,
+                NULL::text AS matched_text,
+                'faq' AS source,
+                f.question_embedding AS embedding
+            FROM faqs f
+            ORDER BY f.question_embedding::{EMBEDDING_HALFVEC} <#> q.vec
+            LIMIT $2
+        )
+        UNION ALL
+        (
+            SELECT
+                fv.id,
+                f.id,
+                f.question,
+                f.answer,
+                fv.variant,
+                'variant',
+                fv.embedding
+            FROM faq_variants fv
+            JOIN faqs f ON f.id = fv.faq_id
+            ORDER BY fv.embedding::{EMBEDDING_HALFVEC} <#> q.vec
+            LIMIT $2
+        )
+    ) r
+"""
+
 
 class RetrievalService:
     def __init__(self):
-        self.db = db_manager
-        self.embeddings = embedding_service
+        self.db = get_db_manager()
+        self.batcher = embedding_batcher
+        self.rerank_k = config.app.rerank_k
+        self.dimensions = config.openai.embedding_dimensions
+        self._buffers = threading.local()
+
+        # Load the BLAS kernels up front so the first request doesn't pay for it.
+        warmup = np.zeros((1, config.openai.embedding_dimensions), dtype=np.float32)
+        self._rerank_scores(warmup, warmup)
+
+        self.db.register_statement("faq_batch_search", BATCH_SEARCH_STATEMENT)
+
+    @cached_property
+    def embeddings(self):
+        return get_embedding_service()
 
     def search_similar_faqs(
             self,
@@ -19,126 +92,107 @@ class RetrievalService:
     ) -> List[Dict]:
         """
         Search for similar FAQs using multiple query embeddings.
-        Searches both faqs and faq_variants tables.
+        Searches both faqs and faq_variants tables: the halfvec indexes propose
+        `rerank_k` candidates per query and table, which are rescored exactly in fp32.
 
         Args:
             query_embeddings: List of embedding vectors to search with
-            top_k: Number of top results to return per query
+            top_k: Number of top results to return
 
         Returns:
             List of dictionaries with match information, deduplicated and sorted by similarity
         """
-        all_matches = []
-
-        for embedding in query_embeddings:
-            faq_matches = self._search_faqs_table(embedding, top_k)
-            all_matches.extend(faq_matches)
-
-            variant_matches = self._search_variants_table(embedding, top_k)
-            all_matches.extend(variant_matches)
+        all_matches = self._batch_search(query_embeddings, max(top_k, self.rerank_k))
 
-        deduplicated = self._deduplicate_matches(all_matches)
+        return self._deduplicate_matches(all_matches, top_k)
 
-        deduplicated.sort(key=lambda x: x['similarity'], reverse=True)
-
-        return deduplicated[:top_k]
-
-    def _search_faqs_table(self, embedding: np.ndarray, top_k: int) -> List[Dict]:
-        """Search in the main faqs table."""
-        query = """
-            SELECT 
-                id,
-                question,
-                answer,
-                1 - (question_embedding <=> %s::vector) as similarity
-            FROM faqs
-            ORDER BY question_embedding <=> %s::vector
-            LIMIT %s;
-        """
+    def _batch_search(self, query_embeddings: List[np.ndarray], candidates_k: int) -> List[Dict]:
+        """Fetch candidates for all query embeddings with a single statement and rescore them."""
+        if not query_embeddings:
+            return []
 
         try:
-            embedding_list = embedding.tolist()
-            results = self.db.execute_query(
-                query,
-                (embedding_list, embedding_list, top_k)
+            results = self.db.execute_prepared(
+                "faq_batch_search",
+                (self._to_halfvec_array(query_embeddings), candidates_k)
             )
 
+            if not results:
+                return []
+
+            candidates = self._decode_vectors([row[5] for row in results])
+            queries = np.vstack(query_embeddings).astype(np.float32, copy=False)
+            scores = self._rerank_scores(candidates, queries)
+
             matches = []
-            for row in results:
+            for row, score in zip(results, scores):
                 matches.append({
                     'faq_id': row[0],
                     'question': row[1],
                     'answer': row[2],
-                    'similarity': float(row[3]),
-                    'source': 'faq',
-                    'matched_text': None
+                    'similarity': self._clamp_similarity(score),
+                    'source': row[4],
+                    'matched_text': row[3]
                 })
 
             return matches
 
         except Exception as e:
-            logger.error(f"Error searching faqs table: {e}")
+            logger.error(f"Error searching FAQs: {e}")
             return []
 
-    def _search_variants_table(self, embedding: np.ndarray, top_k: int) -> List[Dict]:
-        """Search in the faq_variants table and join with faqs."""
-        query = """
-            SELECT 
-                f.id,
-                f.question,
-                f.answer,
-                fv.variant,
-                1 - (fv.embedding <=> %s::vector) as similarity
-            FROM faq_variants fv
-            JOIN faqs f ON f.id = fv.faq_id
-            ORDER BY fv.embedding <=> %s::vector
-            LIMIT %s;
+    def _rerank_scores(self, candidates: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """
+        Exact cosine of each candidate against its closest query (all vectors are unit-length).
+        The score matrix is written into a per-thread buffer that is reused across requests.
         """
+        n, m = candidates.shape[0], queries.shape[0]
 
-        try:
-            embedding_list = embedding.tolist()
-            results = self.db.execute_query(
-                query,
-                (embedding_list, embedding_list, top_k)
-            )
+        buffer = getattr(self._buffers, 'scores', None)
+        if buffer is None or buffer.shape[0] < n or buffer.shape[1] < m:
+            buffer = np.empty((max(n, 256), max(m, 8)), dtype=np.float32)
+            self._buffers.scores = buffer
 
-            matches = []
-            for row in results:
-                matches.append({
-                    'faq_id': row[0],
-                    'question': row[1],
-                    'answer': row[2],
-                    'similarity': float(row[4]),
-                    'source': 'variant',
-                    'matched_text': row[3]
-                })
+        scores = buffer[:n, :m]
+        np.matmul(candidates, queries.T, out=scores)
+        return scores.max(axis=1)
 
-            return matches
+    def _decode_vectors(self, payloads: List[memoryview]) -> np.ndarray:
+        """(N, dimensions) float32 matrix from vector_send payloads; each 4-byte header is one float32 slot."""
+        raw = np.frombuffer(b"".join(payloads), dtype=">f4").reshape(len(payloads), self.dimensions + 1)
+        return raw[:, 1:].astype(np.float32)
 
-        except Exception as e:
-            logger.error(f"Error searching faq_variants table: {e}")
-            return []
+    @staticmethod
+    def _to_halfvec_array(embeddings: List[np.ndarray]) -> str:
+        """Postgres array literal of vectors, e.g. '{"[0.1,0.2]","[0.3,0.4]"}'."""
+        return "{" + ",".join(f'"{to_vector_literal(embedding)}"' for embedding in embeddings) + "}"
+
+    @staticmethod
+    def _clamp_similarity(value) -> float:
+        """Inner products of unit vectors can drift slightly outside [0, 1] through rounding."""
+        return min(1.0, max(0.0, float(value)))
 
     @staticmethod
-    def _deduplicate_matches(matches: List[Dict]) -> List[Dict]:
+    def _deduplicate_matches(matches: List[Dict], top_k: int) -> List[Dict]:
         """
-        Deduplicate matches by faq_id, keeping the one with highest similarity.
+        Deduplicate matches by faq_id, keeping the one with highest similarity,
+        and return the `top_k` best ones sorted by similarity.
         """
-        faq_map = {}
+        faq_map: Dict[int, Dict] = {}
 
         for match in matches:
-            faq_id = match['faq_id']
-
-            if faq_id not in faq_map or match['similarity'] > faq_map[faq_id]['similarity']:
-                faq_map[faq_id] = match
+            current = faq_map.get(match['faq_id'])
+            if current is None or match['similarity'] > current['similarity']:
+                faq_map[match['faq_id']] = match
 
-        return list(faq_map.values())
+        return heapq.nlargest(top_k, faq_map.values(), key=itemgetter('similarity'))
 
     def search_with_metadata(
             self,
             user_query: str,
             query_variants: List[str],
-            top_k: int = 5
+            top_k: int = 5,
+            precomputed_query_embedding: Optional[np.ndarray] = None
     ) -> Tuple[List[Dict], List[np.ndarray]]:
         """
         Perform search with full metadata.
@@ -147,21 +201,41 @@ class RetrievalService:
             user_query: Original user question
             query_variants: Generated question variants
             top_k: Number of results to return
+            precomputed_query_embedding: Normalized embedding of `user_query`, if the caller already has it
 
         Returns:
             Tuple of (matches, embeddings)
         """
-        all_queries = [user_query] + query_variants
-
-        embeddings = []
-        for query in all_queries:
-            embedding = self.embeddings.generate_embedding(query)
-            embedding_vector = self.embeddings.embedding_to_vector(embedding)
-            embeddings.append(embedding_vector)
+        if precomputed_query_embedding is not None:
+            embeddings = [precomputed_query_embedding]
+            if query_variants:
+                embeddings.extend(self.embeddings.generate_embeddings_batch(query_variants))
+        else:
+            embeddings = list(self.embeddings.generate_embeddings_batch([user_query] + query_variants))
 
         matches = self.search_similar_faqs(embeddings, top_k=top_k)
 
         return matches, embeddings
 
+    async def asearch_with_metadata(
+            self,
+            user_query: str,
+            query_variants: List[str],
+            top_k: int = 5,
+            precomputed_query_embedding: Optional[np.ndarray] = None
+    ) -> Tuple[List[Dict], List[np.ndarray]]:
+        """
+        Async counterpart of `search_with_metadata`. Embeddings go through the shared
+        micro-batcher, and the database search runs in a worker thread.
+        """
+        if precomputed_query_embedding is not None:
+            embeddings = [precomputed_query_embedding] + await self.batcher.embed_many(query_variants)
+        else:
+            embeddings = await self.batcher.embed_many([user_query] + query_variants)
+
+        matches = await asyncio.to_thread(self.search_similar_faqs, embeddings, top_k)
+
+        return matches, embeddings
+
 
 retrieval_service = RetrievalService()
@@ -1,33 +1,46 @@
-import json
 import logging
 import re
-from typing import List
+from functools import cached_property
+from typing import List, Tuple
 
-from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
+from langchain_core.output_parsers import JsonOutputParser
+from pydantic import BaseModel
 
 from src.core.config import config
+from src.core.llm_client import make_chat
 from src.api.prompts.variant_prompts import get_variant_generation_prompt
 
 logger = logging.getLogger(__name__)
 
 
+class VariantSchema(BaseModel):
+    paraphrases: List[str]
+
+
 class VariantGenerationService:
     def __init__(self):
         self.config = config
 
-        self.llm = ChatOpenAI(
-            model=config.openai.llm_model,
+        self.prompt_template = get_variant_generation_prompt()
+
+        logger.info("Variant Generation Service initialized")
+
+    @cached_property
+    def llm(self):
+        """Built on first use so importing the service doesn't construct the client."""
+        return make_chat(
             temperature=0.7,
-            api_key=config.openai.api_key,
-            max_tokens=300
+            max_tokens=300,
+            model_kwargs={"response_format": {"type": "json_object"}}
         )
 
-        self.prompt_template = get_variant_generation_prompt()
-
-        self.chain = self.prompt_template | self.llm | StrOutputParser()
+    @cached_property
+    def parser(self):
+        return JsonOutputParser(pydantic_object=VariantSchema)
 
-        logger.info("Variant Generation Service initialized")
+    def _chain(self, temperature: float):
+        """Temperature is bound per call; the shared model is never mutated, so concurrent calls don't race."""
+        return self.prompt_template | self.llm.bind(temperature=temperature) | self.parser
 
     def generate_variants(
             self,
@@ -39,16 +52,42 @@ class VariantGenerationService:
             logger.warning("Empty text provided for variant generation")
             return []
 
-        n = max(1, min(int(n), 10))
-
-        temperature = max(0.0, min(float(temperature), 1.0))
+        n, temperature = self._clamp_params(n, temperature)
 
         try:
             logger.info(f"Generating {n} variants for: {text[:50]}...")
 
-            self.llm.temperature = temperature
+            response = self._chain(temperature).invoke({
+                "text": text,
+                "n": n
+            })
+
+            variants = self._parse_response(response, n)
+
+            logger.info(f"Successfully generated {len(variants)} variants")
+            return variants
+
+        except Exception as e:
+            logger.error(f"Failed to generate variants: {e}", exc_info=True)
+            return []
 
-            response = self.chain.invoke({
+    async def agenerate_variants(
+            self,
+            text: str,
+            n: int = 3,
+            temperature: float = 0.7
+    ) -> List[str]:
+        """Async counterpart of `generate_variants`."""
+        if not text or not text.strip():
+            logger.warning("Empty text provided for variant generation")
+            return []
+
+        n, temperature = self._clamp_params(n, temperature)
+
+        try:
+            logger.info(f"Generating {n} variants for: {text[:50]}...")
+
+            response = await self._chain(temperature).ainvoke({
                 "text": text,
                 "n": n
             })
@@ -62,37 +101,24 @@ class VariantGenerationService:
             logger.error(f"Failed to generate variants: {e}", exc_info=True)
             return []
 
-    def _parse_response(self, response: str, expected_count: int) -> List[str]:
+    @staticmethod
+    def _clamp_params(n: int, temperature: float) -> Tuple[int, float]:
+        return max(1, min(int(n), 10)), max(0.0, min(float(temperature), 1.0))
+
+    def _parse_response(self, response: dict, expected_count: int) -> List[str]:
         """
-        Parse the LLM response to extract variants.
+        Extract variants from the parsed LLM response.
 
         Args:
-            response: Raw response string from LLM
+            response: JSON object returned by the LLM (JSON mode guarantees valid JSON)
             expected_count: Expected number of variants
 
         Returns:
             List of cleaned, deduplicated variant strings
         """
-        variants = []
-
-        try:
-            parsed = json.loads(response)
-
-            variants = [str(x) for x in parsed["paraphrases"]]
-
-        except json.JSONDecodeError:
-            logger.warning("Response is not valid JSON, trying regex extraction")
-
-            match = re.search(r'\[[\s\S]*?]', response)
-            if match:
-                try:
-                    variants = [str(x) for x in json.loads(match.group(0))]
-                except Exception:
-                    logger.warning("Could not extract variants from response")
-
-        cleaned_variants = self._clean_variants(variants, expected_count)
+        variants = [str(x) for x in response.get("paraphrases", [])]
 
-        return cleaned_variants
+        return self._clean_variants(variants, expected_count)
 
     @staticmethod
     def _clean_variants(variants: List[str], expected_count: int) -> List[str]:
@@ -1,11 +1,17 @@
+import math
 import os
+from functools import lru_cache
 from pathlib import Path
-from dataclasses import dataclass
-from typing import Optional
-from dotenv import load_dotenv
+from dataclasses import dataclass, field
+from typing import List, Optional
+from dotenv import dotenv_values
 
 env_path = Path(__file__).parent.parent.parent / '.env'
-load_dotenv(env_path)
+# Parsed once per process; real environment variables take precedence over .env.
+_ENV = {
+    **{key: value for key, value in dotenv_values(env_path).items() if value is not None},
+    **os.environ
+}
 
 
 @dataclass
@@ -15,15 +21,21 @@ class DatabaseConfig:
     database: str = 'faq_db'
     user: str = 'user'
     password: Optional[str] = None
+    pool_min: int = 5
+    pool_max: int = 30
+    pool_recycle: int = 3600
 
     @classmethod
     def from_env(cls):
         return cls(
-            host=os.getenv('DB_HOST', 'localhost'),
-            port=os.getenv('DB_PORT', '5432'),
-            database=os.getenv('POSTGRES_DB', 'faq_db'),
-            user=os.getenv('POSTGRES_USER', 'user'),
-            password=os.getenv('POSTGRES_PASSWORD')
+            host=_ENV.get('DB_HOST', 'localhost'),
+            port=_ENV.get('DB_PORT', '5432'),
+            database=_ENV.get('POSTGRES_DB', 'faq_db'),
+            user=_ENV.get('POSTGRES_USER', 'user'),
+            password=_ENV.get('POSTGRES_PASSWORD'),
+            pool_min=int(_ENV.get('DB_POOL_MIN', '5')),
+            pool_max=int(_ENV.get('DB_POOL_MAX', '30')),
+            pool_recycle=int(_ENV.get('DB_POOL_RECYCLE', '3600'))
         )
 
     def get_connection_params(self) -> dict:
@@ -43,14 +55,20 @@ class OpenAIConfig:
     embedding_model: str = 'text-embedding-3-small'
     embedding_dimensions: int = 1536
     llm_model: str = 'gpt-4o'
+    max_batch_size: int = 96
+    max_concurrency: int = 4
+    max_retries: int = 5
 
     @classmethod
     def from_env(cls):
         return cls(
-            api_key=os.getenv('OPENAI_API_KEY'),
-            embedding_model=os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small'),
-            embedding_dimensions=int(os.getenv('EMBEDDING_DIMENSIONS', '1536')),
-            llm_model=os.getenv('LLM_MODEL', 'gpt-4o')
+            api_key=_ENV.get('OPENAI_API_KEY'),
+            embedding_model=_ENV.get('EMBEDDING_MODEL', 'text-embedding-3-small'),
+            embedding_dimensions=int(_ENV.get('EMBEDDING_DIMENSIONS', '1536')),
+            llm_model=_ENV.get('LLM_MODEL', 'gpt-4o'),
+            max_batch_size=int(_ENV.get('EMBEDDING_BATCH_SIZE', '96')),
+            max_concurrency=int(_ENV.get('EMBEDDING_MAX_CONCURRENCY', '4')),
+            max_retries=int(_ENV.get('OPENAI_MAX_RETRIES', '5'))
         )
 
     def validate(self) -> bool:
@@ -60,13 +78,78 @@ class OpenAIConfig:
 @dataclass
 class AppConfig:
     similarity_threshold: float = 0.75
+    vector_index_type: str = 'hnsw'
+    # HNSW search breadth: higher ef_search raises recall at the cost of latency
+    # (roughly linear in ef_search). The graph degree m and ef_construction are
+    # fixed at build time in db_init; a larger m gives better recall per ef_search
+    # but a bigger index and slower builds. ef_search also caps the rows one
+    # index scan returns, so keep it >= the LIMIT used by retrieval.
+    hnsw_ef_search: int = 64
+    # Candidates fetched per query and table from the halfvec index before the exact
+    # fp32 rescoring. ef_search is raised to at least this value.
+    rerank_k: int = 20
+    ivf_lists: Optional[int] = None
+    ivf_probes: Optional[int] = None
+    cors_origins: List[str] = field(default_factory=lambda: ['*'])
+    api_keys: List[str] = field(default_factory=list)
+    semantic_cache_threshold: float = 0.92
+    semantic_cache_size: int = 1024
+    semantic_cache_ttl: float = 3600.0
 
     @classmethod
     def from_env(cls):
+        ivf_lists = _ENV.get('IVF_LISTS')
+        ivf_probes = _ENV.get('IVF_PROBES')
         return cls(
-            similarity_threshold=float(os.getenv('CONFIDENCE_THRESHOLD', '0.75'))
+            similarity_threshold=float(_ENV.get('CONFIDENCE_THRESHOLD', '0.75')),
+            vector_index_type=_ENV.get('VECTOR_INDEX_TYPE', 'hnsw').lower(),
+            hnsw_ef_search=int(_ENV.get('HNSW_EF_SEARCH', '64')),
+            rerank_k=int(_ENV.get('RERANK_K', '20')),
+            ivf_lists=int(ivf_lists) if ivf_lists else None,
+            ivf_probes=int(ivf_probes) if ivf_probes else None,
+            cors_origins=[
+                origin.strip()
+                for origin in _ENV.get('CORS_ORIGINS', '*').split(',')
+                if origin.strip()
+            ],
+            api_keys=[
+                key.strip()
+                for key in _ENV.get('API_KEYS', '').split(',')
+                if key.strip()
+            ],
+            semantic_cache_threshold=float(_ENV.get('SEMANTIC_CACHE_THRESHOLD', '0.92')),
+            semantic_cache_size=int(_ENV.get('SEMANTIC_CACHE_SIZE', '1024')),
+            semantic_cache_ttl=float(_ENV.get('SEMANTIC_CACHE_TTL', '3600'))
         )
 
+    def get_session_settings(self, vector_count: int = 0) -> dict:
+        """
+        Per-connection planner settings for vector similarity search.
+
+        For IVFFlat, probes default to sqrt(lists), with lists sized from
+        `vector_count` by `ivfflat_lists`, the helper db_init sizes the index with.
+        """
+        if self.vector_index_type == 'hnsw':
+            return {'hnsw.ef_search': max(self.hnsw_ef_search, self.rerank_k)}
+
+        if self.vector_index_type == 'ivfflat':
+            lists = self.ivfflat_lists(vector_count)
+            probes = self.ivf_probes or max(1, round(math.sqrt(lists)))
+            return {'ivfflat.probes': probes}
+
+        return {}
+
+    def ivfflat_lists(self, vector_count: int) -> int:
+        """IVFFlat list count: rows / 1000 up to 1M rows, sqrt(rows) beyond (IVF_LISTS overrides)."""
+        if self.ivf_lists:
+            return self.ivf_lists
+
+        if vector_count <= 1_000_000:
+            lists = round(vector_count / 1000)
+        else:
+            lists = round(math.sqrt(vector_count))
+        return max(1, min(lists, 10000))
+
 
 class Config:
     def __init__(self):
@@ -86,4 +169,9 @@ class Config:
         return len(errors) == 0, errors
 
 
-config = Config()
+@lru_cache(maxsize=None)
+def get_config() -> Config:
+    return Config()
+
+
+config = get_config()
@@ -1,25 +1,160 @@
+import io
 import logging
+import struct
+import threading
+import time
+from functools import lru_cache
+import numpy as np
 import psycopg2
+from pgvector.psycopg2 import register_vector
+from psycopg2.extensions import register_adapter
 from psycopg2.extras import execute_values
-from psycopg2.pool import SimpleConnectionPool
+from psycopg2.pool import ThreadedConnectionPool
 from contextlib import contextmanager
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict, Iterable, Any
 from src.core.config import config
 
 logger = logging.getLogger(__name__)
 
+# COPY ... WITH (FORMAT binary) stream framing.
+COPY_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_BINARY_TRAILER = struct.pack(">h", -1)
+
+# pgvector typecasters and numpy adapter are process-global; registered once.
+_vector_types_lock = threading.Lock()
+_vector_types_registered = False
+
+
+def to_vector_literal(vector) -> str:
+    """pgvector text literal of a float32 vector; 9 significant digits round-trip float32 exactly."""
+    values = np.ascontiguousarray(vector, dtype=np.float32).tolist()
+    return "[" + ",".join(["%.9g"] * len(values)) % tuple(values) + "]"
+
+
+class VectorLiteralAdapter:
+    """
+    Binds numpy arrays as vector literals with one C-level format call, in place of
+    pgvector's adapter, which converts each element through str(float(v)).
+    """
+
+    def __init__(self, value: np.ndarray):
+        self._value = value
+
+    def getquoted(self) -> bytes:
+        return ("'" + to_vector_literal(self._value) + "'").encode("ascii")
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """Connection that tracks which server-side prepared statements it already holds."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+        self.created_at = time.monotonic()
+
+
+class SessionConnectionPool(ThreadedConnectionPool):
+    """
+    Connection pool that prepares every new connection: sets the UTF8 client encoding,
+    registers the pgvector types (vector columns are read as numpy arrays, numpy arrays
+    bind as vectors) and applies session settings.
+    Thread-safe, since the API runs blocking queries in worker threads. Connections
+    older than `recycle_seconds` are closed when returned and replaced on demand.
+    """
+
+    def __init__(
+            self,
+            minconn: int,
+            maxconn: int,
+            session_settings: Optional[Dict] = None,
+            recycle_seconds: int = 0,
+            **kwargs
+    ):
+        self.session_settings = session_settings or {}
+        self.recycle_seconds = recycle_seconds
+        super().__init__(minconn, maxconn, **kwargs)
+
+    def putconn(self, conn=None, key=None, close=False):
+        if (
+            not close
+            and self.recycle_seconds
+            and time.monotonic() - getattr(conn, 'created_at', time.monotonic()) > self.recycle_seconds
+        ):
+            close = True
+        super().putconn(conn, key, close)
+
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        # No-op when the server default is already UTF8; otherwise set once per connection.
+        conn.set_client_encoding('UTF8')
+        self._register_vector(conn)
+        self._apply_session_settings(conn)
+        return conn
+
+    @staticmethod
+    def _register_vector(conn):
+        """
+        Register the pgvector typecasters globally from the first connection, then
+        replace pgvector's ndarray adapter with VectorLiteralAdapter, once per process.
+        """
+        global _vector_types_registered
+        if _vector_types_registered:
+            return
+
+        with _vector_types_lock:
+            if _vector_types_registered:
+                return
+            try:
+                register_vector(conn, globally=True)
+            except psycopg2.ProgrammingError as e:
+                logger.warning(f"pgvector types not registered: {e}")
+                return
+            register_adapter(np.ndarray, VectorLiteralAdapter)
+            _vector_types_registered = True
+
+    def update_session_settings(self, session_settings: Dict):
+        """Replace the session settings and apply them to the idle connections."""
+        with self._lock:
+            self.session_settings = session_settings
+            for conn in self._pool:
+                self._apply_session_settings(conn)
+
+    def _apply_session_settings(self, conn):
+        if not self.session_settings:
+            return
+
+        with conn.cursor() as cursor:
+            for name, value in self.session_settings.items():
+                cursor.execute(f"SET {name} = %s", (value,))
+        conn.commit()
+
 
 class DatabaseManager:
     def __init__(self):
         self.config = config.database
-        self._pool: Optional[SimpleConnectionPool] = None
+        self._pool: Optional[SessionConnectionPool] = None
+        self._startup_stats: Optional[Dict] = None
+        self._statements: Dict[str, str] = {}
+        # table name -> exists. Write-once for the process: tables are created and dropped
+        # only by db_init/initialize.py, never through DatabaseManager.
+        self._existing_tables: Dict[str, bool] = {}
 
-    def initialize_pool(self, minconn: int = 1, maxconn: int = 5):
+        self.register_statement(
+            "table_exists_q",
+            "SELECT EXISTS (SELECT 1 FROM information_schema.tables "
+            "WHERE table_schema = 'public' AND table_name = $1)"
+        )
+
+    def initialize_pool(self, minconn: Optional[int] = None, maxconn: Optional[int] = None):
+        """Pool sizes default to DB_POOL_MIN / DB_POOL_MAX."""
         if not self._pool:
             try:
-                self._pool = SimpleConnectionPool(
-                    minconn=minconn,
-                    maxconn=maxconn,
+                self._pool = SessionConnectionPool(
+                    minconn=minconn or self.config.pool_min,
+                    maxconn=maxconn or self.config.pool_max,
+                    session_settings=config.app.get_session_settings(),
+                    recycle_seconds=self.config.pool_recycle,
+                    connection_factory=PreparingConnection,
                     **self.config.get_connection_params()
                 )
                 logger.info("Database connection pool initialized")
@@ -27,6 +162,11 @@ class DatabaseManager:
                 logger.error(f"Failed to initialize connection pool: {e}")
                 raise
 
+    def configure_session(self, session_settings: Dict):
+        if not self._pool:
+            self.initialize_pool()
+        self._pool.update_session_settings(session_settings)
+
     def close_pool(self):
         if self._pool:
             self._pool.closeall()
@@ -61,46 +201,212 @@ class DatabaseManager:
                 cursor.close()
 
     def execute_query(self, query: str, params: Optional[Tuple] = None) -> List[Tuple]:
-        with self.get_cursor(commit=False) as cursor:
-            cursor.execute(query, params)
-            return cursor.fetchall()
+        return self._run(query, params, commit=False, fetch=True)
 
     def execute_update(self, query: str, params: Optional[Tuple] = None) -> int:
-        with self.get_cursor() as cursor:
-            cursor.execute(query, params)
-            return cursor.rowcount
+        return self._run(query, params, commit=True, fetch=False)
+
+    def _run(self, query: str, params: Optional[Tuple], commit: bool, fetch: bool):
+        """
+        Single-statement fast path: borrows a pooled connection directly instead of
+        going through the get_connection/get_cursor context managers.
+        """
+        if not self._pool:
+            self.initialize_pool()
+
+        conn = self._pool.getconn()
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, params)
+                result = cursor.fetchall() if fetch else cursor.rowcount
+            finally:
+                cursor.close()
+            if commit:
+                conn.commit()
+            return result
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Database operation failed: {e}")
+            raise
+        finally:
+            self._pool.putconn(conn)
 
-    def batch_insert(self, query: str, values: List[Tuple], template: Optional[str] = None) -> int:
+    def register_statement(self, name: str, query: str):
+        """
+        Register a query (using $1, $2, ... placeholders) that `execute_prepared` runs
+        as a server-side prepared statement. Each connection PREPAREs it on first use.
+        """
+        self._statements[name] = query
+
+    def execute_prepared(self, name: str, params: Tuple = ()) -> List[Tuple]:
+        with self.get_cursor(commit=False) as cursor:
+            conn = cursor.connection
+            if name not in conn.prepared_statements:
+                cursor.execute(f"PREPARE {name} AS {self._statements[name]}")
+                conn.prepared_statements.add(name)
+
+            if params:
+                placeholders = ", ".join(["%s"] * len(params))
+                cursor.execute(f"EXECUTE {name}({placeholders})", params)
+            else:
+                cursor.execute(f"EXECUTE {name}")
+            return cursor.fetchall()
+
+    def batch_insert(
+            self,
+            query: str,
+            values: List[Tuple],
+            template: Optional[str] = None,
+            page_size: int = 500
+    ) -> int:
         with self.get_cursor() as cursor:
-            execute_values(cursor, query, values, template=template)
-            return cursor.rowcount
+            inserted = 0
+            for start in range(0, len(values), page_size):
+                page = values[start:start + page_size]
+                execute_values(cursor, query, page, template=template, page_size=len(page))
+                inserted += cursor.rowcount
+            return inserted
 
-    def execute_query_with_batch(self, query: str, values: List[Tuple], template: Optional[str] = None) -> List[Tuple]:
+    def execute_query_with_batch(
+            self,
+            query: str,
+            values: List[Tuple],
+            template: Optional[str] = None,
+            page_size: int = 500
+    ) -> List[Tuple]:
         with self.get_cursor() as cursor:
             result = execute_values(
                 cursor,
                 query,
                 values,
                 template=template,
+                page_size=page_size,
                 fetch=True
             )
             return result if result else []
 
-    def table_exists(self, table_name: str) -> bool:
+    def copy_insert(self, table: str, columns: List[str], rows: Iterable[Tuple], cursor=None) -> int:
+        """
+        Bulk load rows with COPY ... FROM STDIN in binary format.
+
+        Values are encoded by Python type: str -> text, int -> integer (int4),
+        float -> double precision, bool, bytes -> bytea, None -> NULL, and
+        arrays, lists and tuples -> pgvector `vector`. Column types must match exactly.
+        Pass `cursor` to run the COPY inside an existing transaction.
+        """
+        if cursor is None:
+            with self.get_cursor() as own_cursor:
+                return self.copy_insert(table, columns, rows, cursor=own_cursor)
+
+        buffer = io.BytesIO()
+        buffer.write(COPY_BINARY_HEADER)
+        for row in rows:
+            buffer.write(struct.pack(">h", len(row)))
+            for value in row:
+                if value is None:
+                    buffer.write(struct.pack(">i", -1))
+                else:
+                    field = self._to_copy_field(value)
+                    buffer.write(struct.pack(">i", len(field)))
+                    buffer.write(field)
+        buffer.write(COPY_BINARY_TRAILER)
+        buffer.seek(0)
+
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT binary)",
+            buffer
+        )
+        return cursor.rowcount
+
+    @staticmethod
+    def _to_copy_field(value: Any) -> bytes:
+        if isinstance(value, (np.ndarray, list, tuple)):
+            # pgvector binary format: int16 dim, int16 unused, then big-endian float32s.
+            vector = np.asarray(value, dtype=">f4")
+            return struct.pack(">hh", vector.size, 0) + vector.tobytes()
+        if isinstance(value, str):
+            return value.encode("utf-8")
+        if isinstance(value, bool):
+            return struct.pack(">?", value)
+        if isinstance(value, int):
+            return struct.pack(">i", value)
+        if isinstance(value, float):
+            return struct.pack(">d", value)
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        raise TypeError(f"Unsupported COPY value type: {type(value).__name__}")
+
+    def ensure_tables_cached(self, table_names: List[str]):
+        """Check several tables in one round trip; table_exists then answers from the cache."""
         query = """
-            SELECT EXISTS (
-                SELECT 1 FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_name = %s
-            );
+            SELECT table_name FROM information_schema.tables
+            WHERE table_schema = 'public'
+            AND table_name = ANY(%s);
         """
-        result = self.execute_query(query, (table_name,))
-        return result[0][0] if result else False
+        found = {row[0] for row in self.execute_query(query, (list(table_names),))}
+        self._existing_tables.update({name: name in found for name in table_names})
+
+    def table_exists(self, table_name: str) -> bool:
+        if table_name not in self._existing_tables:
+            result = self.execute_prepared("table_exists_q", (table_name,))
+            self._existing_tables[table_name] = bool(result and result[0][0])
+        return self._existing_tables[table_name]
 
     def get_table_count(self, table_name: str) -> int:
         query = f"SELECT COUNT(*) FROM {table_name};"
         result = self.execute_query(query)
         return result[0][0] if result else 0
 
+    def get_estimated_count(self, table_name: str) -> int:
+        """
+        Planner row estimate from pg_class.reltuples; avoids the full scan of COUNT(*).
+        Tables never analyzed (reltuples = -1) fall back to COUNT(*).
+        """
+        query = """
+            SELECT reltuples::bigint
+            FROM pg_class
+            WHERE oid = to_regclass(%s);
+        """
+        result = self.execute_query(query, (f"public.{table_name}",))
+        if not result or result[0][0] is None:
+            return 0
+        return self._count_if_unanalyzed(table_name, result[0][0])
+
+    def _count_if_unanalyzed(self, table_name: str, reltuples: int) -> int:
+        return reltuples if reltuples >= 0 else self.get_table_count(table_name)
+
+    def ping(self) -> bool:
+        result = self.execute_query("SELECT 1;")
+        return bool(result and result[0][0] == 1)
+
+    def get_startup_stats(self) -> Dict:
+        """
+        Table existence and estimated row counts for faqs/faq_variants in one round trip.
+        Counts come from pg_class.reltuples (planner estimate); only tables that were
+        never analyzed are counted exactly. The result is cached for the lifetime of the process.
+        """
+        if self._startup_stats is not None:
+            return self._startup_stats
+
+        query = """
+            SELECT
+                to_regclass('public.faqs') IS NOT NULL,
+                to_regclass('public.faq_variants') IS NOT NULL,
+                (SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass('public.faqs')),
+                (SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass('public.faq_variants'));
+        """
+        row = self.execute_query(query)[0]
+
+        self._startup_stats = {
+            'faqs_exists': row[0],
+            'faq_variants_exists': row[1],
+            'faq_count': self._count_if_unanalyzed('faqs', row[2]) if row[0] else 0,
+            'variant_count': self._count_if_unanalyzed('faq_variants', row[3]) if row[1] else 0
+        }
+        return self._startup_stats
+
 
-db_manager = DatabaseManager()
+@lru_cache(maxsize=None)
+def get_db_manager() -> DatabaseManager:
+    return DatabaseManager()
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from typing import List, Optional, Set, Tuple
+import numpy as np
+from src.core.embeddings import get_embedding_service, EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into batched API calls.
+
+    Callers await `embed(text)`; a background worker collects queued texts for up to
+    `max_wait` seconds or `max_batch_size` texts and sends them in one request.
+    Texts are looked up in the service's in-process and persistent caches first, and
+    new embeddings are written back to both. Returned vectors are read-only, unit-length
+    float32 arrays.
+    """
+
+    def __init__(
+            self,
+            service: Optional[EmbeddingService] = None,
+            max_batch_size: int = 32,
+            max_wait: float = 0.005
+    ):
+        self._service = service
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    @property
+    def service(self) -> EmbeddingService:
+        if self._service is None:
+            self._service = get_embedding_service()
+        return self._service
+
+    async def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+            logger.info("Embedding batcher started")
+
+    async def stop(self):
+        if self._worker is None:
+            return
+
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        if self._service is not None:
+            await self._service.drain_cache_writes()
+
+        while not self._queue.empty():
+            self._fail_stopped([self._queue.get_nowait()])
+        logger.info("Embedding batcher stopped")
+
+    async def embed(self, text: str) -> np.ndarray:
+        text = text.strip()
+        vector = self.service.cached_embedding(text)
+        if vector is not None:
+            return vector
+
+        if self._worker is None:
+            return (await self._embed_texts([text]))[0]
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> List[np.ndarray]:
+        return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        items = []
+
+        try:
+            while True:
+                items = [await self._queue.get()]
+                deadline = loop.time() + self.max_wait
+
+                while len(items) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                # Send the batch without blocking collection of the next one.
+                self._spawn(self._flush(items))
+                items = []
+        except asyncio.CancelledError:
+            # Texts already taken off the queue would otherwise leave their callers waiting forever.
+            self._fail_stopped(items)
+            raise
+
+    @staticmethod
+    def _fail_stopped(items: List[Tuple[str, asyncio.Future]]):
+        for _, future in items:
+            if not future.done():
+                future.set_exception(RuntimeError("Embedding batcher stopped"))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _flush(self, items: List[Tuple[str, asyncio.Future]]):
+        try:
+            vectors = await self._embed_texts([text for text, _ in items])
+        except Exception as e:
+            logger.error(f"Failed to generate embeddings for batch of {len(items)} texts: {e}")
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), vector in zip(items, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    async def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed through the service; its persistent cache write is not awaited, so callers aren't held up by it."""
+        out = await self.service.agenerate_embeddings_batch(texts, wait_for_store=False)
+        out.setflags(write=False)
+        return out
+
+embedding_batcher = EmbeddingBatcher()
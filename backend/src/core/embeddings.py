@@ -1,11 +1,54 @@
+import asyncio
+import hashlib
 import logging
-from typing import List
+import threading
+from functools import cached_property, lru_cache
+from typing import Callable, Dict, List, Optional, Set, Tuple
 import numpy as np
-from openai import OpenAI
+import psycopg2
+import tiktoken
+from cachetools import LRUCache
+from openai import AsyncOpenAI, OpenAI
 from src.core.config import config
+from src.core.database import get_db_manager
+from src.core.llm_client import shared_async_http_client, shared_http_client
 
 logger = logging.getLogger(__name__)
 
+# Keeps normalization branch-free; a zero vector stays zero.
+NORM_EPSILON = 1e-12
+
+# Per-request limits of the embeddings API (8191 tokens, 2048 inputs), with some headroom.
+MAX_TOKENS_PER_REQUEST = 8000
+MAX_INPUTS_PER_REQUEST = 2048
+
+
+def pack_batches(
+        texts: List[str],
+        count_tokens: Callable[[str], int],
+        max_tokens: int = MAX_TOKENS_PER_REQUEST,
+        max_items: int = MAX_INPUTS_PER_REQUEST
+) -> List[List[int]]:
+    """
+    Group text indices into consecutive batches that stay within both the token and item caps.
+    A single text longer than `max_tokens` gets a batch of its own.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
 
 class EmbeddingService:
     def __init__(self):
@@ -13,24 +56,271 @@ class EmbeddingService:
         if not self.config.validate():
             raise ValueError("OpenAI API key not configured")
 
-        self.client = OpenAI(api_key=self.config.api_key)
+        # Both clients retry 429/5xx responses with exponential backoff.
+        self.client = OpenAI(
+            api_key=self.config.api_key,
+            http_client=shared_http_client,
+            max_retries=self.config.max_retries
+        )
+        self.aclient = AsyncOpenAI(
+            api_key=self.config.api_key,
+            http_client=shared_async_http_client,
+            max_retries=self.config.max_retries
+        )
         self.model = self.config.embedding_model
         self.dimensions = self.config.embedding_dimensions
+        # In-process cache shared by generate_embedding and the async embedding batcher.
+        self._memory = LRUCache(maxsize=10000)
+        self._memory_lock = threading.Lock()
+        self._memory_hits = 0
+        self._memory_misses = 0
+        self._pending_writes: Set[asyncio.Task] = set()
+
+    def generate_embedding(self, text: str) -> np.ndarray:
+        """
+        Embed a single text as a unit-length float32 vector.
+        Repeated texts are served from an in-process LRU cache; the returned array is
+        shared with the cache and read-only, so copy it before modifying in place.
+        """
+        text = text.strip()
+        vector = self.cached_embedding(text)
+        if vector is None:
+            vector = self._embed(self.model, text)
+            self.remember(text, vector)
+        return vector
+
+    def cached_embedding(self, text: str) -> Optional[np.ndarray]:
+        """In-process cache lookup only (no database or API call); `text` must already be stripped."""
+        with self._memory_lock:
+            vector = self._memory.get((self.model, text))
+            if vector is None:
+                self._memory_misses += 1
+            else:
+                self._memory_hits += 1
+            return vector
+
+    def remember(self, text: str, vector: np.ndarray):
+        with self._memory_lock:
+            self._memory[(self.model, text)] = self._read_only(vector)
+
+    @cached_property
+    def encoder(self) -> tiktoken.Encoding:
+        try:
+            return tiktoken.encoding_for_model(self.model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoder.encode(text))
+
+    def cache_info(self) -> Dict[str, int]:
+        """Hit/miss statistics of the in-process embedding cache."""
+        with self._memory_lock:
+            return {
+                'hits': self._memory_hits,
+                'misses': self._memory_misses,
+                'size': len(self._memory),
+                'maxsize': int(self._memory.maxsize)
+            }
+
+    def _embed(self, model: str, text: str) -> np.ndarray:
+        """Keyed on (model, text), so switching the embedding model never serves stale vectors."""
+        key = self._cache_key(model, text)
+        stored = self._load_cached([key])
+        if key in stored:
+            return self._read_only(stored[key])
 
-    def generate_embedding(self, text: str) -> List[float]:
         try:
             response = self.client.embeddings.create(
-                model=self.model,
+                model=model,
                 input=text
             )
-            return response.data[0].embedding
         except Exception as e:
             logger.error(f"Failed to generate embedding for text: {e}")
             raise
 
+        vector = self.normalize(np.asarray(response.data[0].embedding, dtype=np.float32))
+        self._store_cached([(key, model, vector)])
+        return self._read_only(vector)
+
     @staticmethod
-    def embedding_to_vector(embedding: List[float]) -> np.ndarray:
+    def _read_only(vector: np.ndarray) -> np.ndarray:
+        vector.setflags(write=False)
+        return vector
+
+    def generate_embeddings_batch(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        Embed many texts, packing each API request with up to `batch_size` inputs
+        (default: EMBEDDING_BATCH_SIZE) within the per-request token limit.
+        Texts are stripped first, as in `generate_embedding`, so all paths share cache keys.
+        Texts found in the in-process or persistent embedding cache are not sent to the API.
+        Returns an (N, dimensions) float32 matrix of unit-length rows in input order.
+        """
+        texts = [text.strip() for text in texts]
+        out, keys, missing = self._prefill_from_cache(texts)
+
+        for chunk in self._plan_requests(texts, missing, batch_size):
+            try:
+                response = self.client.embeddings.create(
+                    model=self.model,
+                    input=[texts[i] for i in chunk]
+                )
+            except Exception as e:
+                logger.error(f"Failed to generate embeddings for batch of {len(chunk)} texts: {e}")
+                raise
+
+            self._fill_chunk(out, chunk, response)
+            self._store_cached([(keys[i], self.model, out[i]) for i in chunk])
+
+        self._remember_rows(texts, out, missing)
+        return out
+
+    async def agenerate_embeddings_batch(
+            self,
+            texts: List[str],
+            batch_size: Optional[int] = None,
+            wait_for_store: bool = True
+    ) -> np.ndarray:
+        """
+        Async `generate_embeddings_batch`: the API requests are sent concurrently,
+        at most EMBEDDING_MAX_CONCURRENCY at a time, so wall time stays close to
+        one request's latency as long as the rate limit allows.
+        With `wait_for_store=False` the persistent cache write runs in the background;
+        `drain_cache_writes()` waits for such writes.
+        """
+        texts = [text.strip() for text in texts]
+        out, keys, missing = await asyncio.to_thread(self._prefill_from_cache, texts)
+        semaphore = asyncio.Semaphore(self.config.max_concurrency)
+
+        async def embed_chunk(chunk: List[int]):
+            async with semaphore:
+                try:
+                    response = await self.aclient.embeddings.create(
+                        model=self.model,
+                        input=[texts[i] for i in chunk]
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to generate embeddings for batch of {len(chunk)} texts: {e}")
+                    raise
+            self._fill_chunk(out, chunk, response)
+
+        await asyncio.gather(*(
+            embed_chunk(chunk) for chunk in self._plan_requests(texts, missing, batch_size)
+        ))
+
+        self._remember_rows(texts, out, missing)
+        store = asyncio.to_thread(self._store_cached, [(keys[i], self.model, out[i]) for i in missing])
+        if wait_for_store:
+            await store
+        else:
+            task = asyncio.create_task(store)
+            self._pending_writes.add(task)
+            task.add_done_callback(self._pending_writes.discard)
+        return out
+
+    async def drain_cache_writes(self):
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+
+    def _prefill_from_cache(self, texts: List[str]) -> Tuple[np.ndarray, List[bytes], List[int]]:
+        """
+        Output matrix with cached rows filled in, the cache keys, and the indices still to embed.
+        The in-process cache is checked first; only its misses are looked up in the database.
+        """
+        out = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        keys = [self._cache_key(self.model, text) for text in texts]
+
+        not_in_memory = []
+        for i, text in enumerate(texts):
+            vector = self.cached_embedding(text)
+            if vector is None:
+                not_in_memory.append(i)
+            else:
+                out[i] = vector
+
+        stored = self._load_cached(list({keys[i] for i in not_in_memory}))
+        missing = []
+        for i in not_in_memory:
+            if keys[i] in stored:
+                out[i] = stored[keys[i]]
+            else:
+                missing.append(i)
+        self._remember_rows(texts, out, [i for i in not_in_memory if keys[i] in stored])
+
+        if len(missing) < len(texts):
+            logger.info(f"Embedding cache: {len(texts) - len(missing)}/{len(texts)} texts already embedded")
+        return out, keys, missing
+
+    def _remember_rows(self, texts: List[str], out: np.ndarray, indices: List[int]):
+        """Copy rows into the in-process cache; `out` itself stays writable for the caller."""
+        for i in indices:
+            self.remember(texts[i], out[i].copy())
+
+    def _plan_requests(self, texts: List[str], missing: List[int], batch_size: Optional[int]) -> List[List[int]]:
+        """Split the texts at indices `missing` into token-budgeted request batches."""
+        batches = pack_batches(
+            [texts[i] for i in missing],
+            count_tokens=self.count_tokens,
+            max_items=min(batch_size or self.config.max_batch_size, MAX_INPUTS_PER_REQUEST)
+        )
+        return [[missing[j] for j in batch] for batch in batches]
+
+    def _fill_chunk(self, out: np.ndarray, chunk: List[int], response):
+        for item in response.data:
+            out[chunk[item.index]] = item.embedding
+        out[chunk] = self.normalize_rows(out[chunk])
+
+    @staticmethod
+    def _cache_key(model: str, text: str) -> bytes:
+        return hashlib.sha256((model + "\0" + text).encode()).digest()
+
+    @staticmethod
+    def _load_cached(keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Embeddings stored by earlier runs, by cache key. Cache failures never block embedding."""
+        if not keys:
+            return {}
+        try:
+            rows = get_db_manager().execute_query(
+                "SELECT hash, embedding FROM embedding_cache WHERE hash = ANY(%s::bytea[])",
+                ([psycopg2.Binary(key) for key in keys],)
+            )
+            return {bytes(key): np.asarray(embedding, dtype=np.float32) for key, embedding in rows}
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            return {}
+
+    @staticmethod
+    def _store_cached(entries: List[Tuple[bytes, str, np.ndarray]]):
+        if not entries:
+            return
+        try:
+            get_db_manager().batch_insert(
+                "INSERT INTO embedding_cache (hash, model, embedding) VALUES %s ON CONFLICT (hash) DO NOTHING",
+                [(psycopg2.Binary(key), model, embedding) for key, model, embedding in entries]
+            )
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    @staticmethod
+    def embedding_to_vector(embedding) -> np.ndarray:
         return np.array(embedding, dtype=np.float32)
 
+    @staticmethod
+    def normalize(vector: np.ndarray) -> np.ndarray:
+        """
+        Scale to unit L2 norm. Stored and query vectors are unit-length, so
+        cosine similarity equals the inner product (pgvector `<#>`).
+        """
+        return vector / (np.linalg.norm(vector) + NORM_EPSILON)
+
+    @staticmethod
+    def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+        """Scale every row of a float32 matrix to unit L2 norm, in place."""
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + NORM_EPSILON
+        return matrix
+
 
-embedding_service = EmbeddingService()
+@lru_cache(maxsize=None)
+def get_embedding_service() -> EmbeddingService:
+    """Built on first use, so importing this module needs no API key and creates no client."""
+    return EmbeddingService()
@@ -0,0 +1,25 @@
+import httpx
+from langchain_openai import ChatOpenAI
+from src.core.config import config
+
+# Enough connections for the concurrent embedding fan-out plus LLM calls. Idle
+# connections are kept for 30s (httpx default: 5s) so they survive the gaps
+# between request bursts instead of repeating the TLS handshake.
+HTTP_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=50, keepalive_expiry=30.0)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+# One connection pool per process for every OpenAI client, so TLS handshakes
+# are paid once and HTTP/2 multiplexes concurrent requests.
+shared_http_client = httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+shared_async_http_client = httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+
+
+def make_chat(**kwargs) -> ChatOpenAI:
+    """ChatOpenAI for the configured model, sending its requests over the shared connection pools."""
+    kwargs.setdefault("model", config.openai.llm_model)
+    kwargs.setdefault("api_key", config.openai.api_key)
+    return ChatOpenAI(
+        http_client=shared_http_client,
+        http_async_client=shared_async_http_client,
+        **kwargs
+    )